@@ -1,515 +1,168 @@
 from datetime import datetime
-from flask import Flask, render_template, flash, redirect, url_for, request
-from flask_ckeditor import CKEditor
-from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-from webforms import UserForm, PostForm, NamerForm, LoginForm, SearchForm
-from werkzeug.security import generate_password_hash, check_password_hash
-
-# Imports for saving file to folder and filename to db
-from werkzeug.utils import secure_filename  # Securing against injection attacks
-import uuid as uuid # Creates unique user id
-import os   # to save the file
-
-
-""" CONFIG """
-# Initializing the app
-app = Flask(__name__)
-# App Configurations
-app.config['SECRET_KEY'] = 'pass'   # Secret Key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db' # Database
-
-# Rich Text Editor
-ckeditor = CKEditor(app)
-
-# Image upload folder
-UPLOAD_FOLDER = 'static/images/'
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-
-# Initializing the DB
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-# Flask Logic Configuration
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = "login"
-
-# Loading users from Users model
-@login_manager.user_loader
-def load_user(user_id):
-    return Users.query.get(int(user_id))
-
-
-""" MODELS """
-# Users Model
-class Users(db.Model, UserMixin):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(20), nullable=False, unique=True)
-    name = db.Column(db.String(200), nullable=False)
-    email = db.Column(db.String(120), nullable=False, unique=True)
-    fav_color = db.Column(db.String(120))
-    date_added = db.Column(db.DateTime, default=datetime.now)
-    password_hash = db.Column(db.String(128), nullable=False)
-    # Users can have multiple posts (One to Many)
-    posts = db.relationship('Posts', backref='poster')
-    about_author = db.Column(db.Text(500), nullable=True)
-    profile_pic = db.Column(db.String(), nullable=True)
-
-    # A way to add a constraint at the db level would need - 
-        # from sqlalchemy import CheckConstraint
-    """__table_args__ = (
-        CheckConstraint("length(name) <= 200", name="check_name_length"),
-    )
-    """
-
-    # Password hashing
-    @property
-    def password(self):
-        raise AttributeError("Password is not a readable attribute!")
-    
-    @password.setter
-    def password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
-    
-    # Repr
-    def __repr__(self):
-        return '<Name %r>' % self.name
-
-# Post Model
-class Posts(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(255), nullable=False)
-    # author = db.Column(db.String(255), nullable=False)    # Removed
-    slug = db.Column(db.String(255), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    date_posted = db.Column(db.DateTime, default=datetime.now)
-    poster_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+from flask import Flask, current_app, render_template
+
+from compression import CollapseWhitespace, Compressor
+from config import Config
+from db_config import engine_options, tune_sqlite
+from extensions import db, login_manager
+from fragment_cache import make_cache
+from helpers import FRAGMENTS, avatar_url, csrf_input, post_fragment, url_with_args
+from image_pipeline import Thumbnailer
+from metrics import Metrics
+from models import Sessions
+from password_hasher import PasswordHasher, HasherBusy
+from post_content import excerpt, sanitize_html
+from profiler import RequestProfiler
+from rate_limit import RateLimited, make_limiter
+from session_store import DatabaseSessionStore, MemorySessionStore, ServerSessionInterface
+from static_assets import StaticAssets
+from user_cache import UserCache
+
+import auth
+import blog
+import click
+import commands
+import os
+import users
+
+
+""" APP FACTORY """
+# Builds the whole app, config is a dict of settings over the defaults in config.py
+    # gunicorn runs "app:create_app()" (see gunicorn.conf.py), "flask" finds create_app by itself
+    # Routes live in blueprints: auth.py (login, dashboard), users.py (user management), blog.py (posts)
+def create_app(config=None):
+    # Initializing the app
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.from_mapping(config or {})
+    if app.config['SQLALCHEMY_ENGINE_OPTIONS'] is None:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    if app.config['SEARCH_INDEX_PATH'] is None:
+        app.config['SEARCH_INDEX_PATH'] = os.path.join(app.instance_path, 'search_index.pkl.gz')
+    if app.config['STATIC_BUILD_FOLDER'] is None:
+        app.config['STATIC_BUILD_FOLDER'] = os.path.join(app.static_folder, 'build')
+    if app.config['RATE_LIMIT_PATH'] is None:
+        app.config['RATE_LIMIT_PATH'] = os.path.join(app.instance_path, 'rate_limits.db')
+
+    # Initializing the DB (no connection is opened here, so gunicorn --preload workers never share one)
+    db.init_app(app)
+    login_manager.init_app(app)
+    # "flask db ..." only, see MigrateGroup
+    app.cli.add_command(MigrateGroup("db", help="Perform database migrations."))
+
+    # Per app services (see extensions.py)
+    app.extensions['password_hasher'] = PasswordHasher(app.config['PASSWORD_HASH_METHOD'],
+                                                       app.config['PASSWORD_HASH_WORKERS'],
+                                                       app.config['PASSWORD_HASH_MAX_PENDING'])
+    app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    app.extensions['fragment_cache'] = make_cache(app.config, names=FRAGMENTS)
+    # Makes the resized profile pics in a background thread (see image_pipeline.py)
+    app.extensions['thumbnailer'] = Thumbnailer(app.config['UPLOAD_FOLDER'], app.config['THUMBNAIL_FOLDER'], app.logger)
+    # Token buckets for login, search & sign up (see rate_limit.py), None when off
+    app.extensions['rate_limiter'] = make_limiter(app.config, app.logger)
+    with app.app_context():
+        tune_sqlite(db.engine)  # WAL, synchronous=NORMAL & mmap on each new SQLite connection
+        app.extensions['profiler'] = RequestProfiler(app, db.engine)  # Query counts & timings per request
+        # Prometheus metrics per route, DB pool & caches (see metrics.py)
+        app.extensions['metrics'] = Metrics(app, db.engine, caches={"fragment": app.extensions['fragment_cache'],
+                                                                    "user": app.extensions['user_cache']})
+        # Only an id in the session cookie, the rest is loaded when used (see session_store.py)
+        if app.config['SESSION_BACKEND'] != 'cookie':
+            store = (DatabaseSessionStore(db.engine, Sessions.__table__) if app.config['SESSION_BACKEND'] == 'database'
+                     else MemorySessionStore())
+            app.session_interface = ServerSessionInterface(store, app.config['SESSION_PURGE_INTERVAL'], app.logger)
+
+    # Templates
+    app.add_template_global(post_fragment)
+    app.add_template_global(avatar_url)
+    app.add_template_global(url_with_args)
+    app.add_template_global(csrf_input)    # Search box & delete buttons, instead of a FlaskForm per render
+    # Posts written before content_html existed (until "flask backfill-content" has run)
+    app.add_template_filter(sanitize_html)
+    app.add_template_filter(excerpt)
+    if app.config['MINIFY_HTML']:
+        app.jinja_env.add_extension(CollapseWhitespace)
+
+    # Static files: content hashed URLs, precompressed & cached for good once "flask build-static" has run
+    app.extensions['static_assets'] = StaticAssets(app.static_folder,
+                                                   app.config['STATIC_BUILD_FOLDER'],
+                                                   app.config['STATIC_CACHE_MAX_AGE'])
+    app.url_defaults(app.extensions['static_assets'].hashed_url)
+    app.view_functions['static'] = app.extensions['static_assets'].send
+
+    # Routes
+    app.add_url_rule("/", view_func=index)
+    app.add_url_rule("/test_date", view_func=test_date)
+    app.register_blueprint(auth.bp)
+    app.register_blueprint(users.bp)
+    app.register_blueprint(blog.bp)
+
+    # Error pages
+    app.register_error_handler(404, page_not_found)
+    app.register_error_handler(500, server_error)
+    app.register_error_handler(HasherBusy, hasher_busy)
+    app.register_error_handler(RateLimited, too_many_requests)
+
+    # gzip/brotli for dynamic responses, asgi.py compresses its own views with it too
+    if app.config['COMPRESS_RESPONSES']:
+        app.extensions['compressor'] = Compressor(app.wsgi_app,
+                                                  app.config['COMPRESS_MIN_SIZE'],
+                                                  app.config['COMPRESS_MIMETYPES'],
+                                                  app.config['COMPRESS_GZIP_LEVEL'],
+                                                  app.config['COMPRESS_BROTLI_QUALITY'])
+        app.wsgi_app = app.extensions['compressor']
+
+    for command in commands.COMMANDS:
+        app.cli.add_command(command)
+    return app
+
+
+# Flask-Migrate (& alembic, the slowest import of the app) loaded once a "flask db" command runs
+    # Only stands in for Flask-Migrate's own "db" group, which parses & runs the command
+class MigrateGroup(click.Group):
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli_group
+        if 'migrate' not in current_app.extensions:
+            Migrate(current_app._get_current_object(), db)
+        return db_cli_group.make_context(info_name, args, parent=parent, **extra)
 
 
 """ ROUTES """
 # Main page
-@app.route("/")
 def index():
     title = "Flasker"
     toppings = ['paneer', 'chicken', 'oregano', 'garlic']
-    return render_template("home.html", 
-                           title = title, 
+    return render_template("home.html",
+                           title = title,
                            toppings = toppings)
 
-
-""" CONTEXT PROCESSOR """
-@app.context_processor
-def base():
-    # Global variable for all templates
-    form = SearchForm()
-    return dict(form=form)
+# JSON Page
+def test_date():
+    return {"Date: ": datetime.now()}
 
 
 """ ERROR PAGES """
-@app.errorhandler(404)
 def page_not_found(e):
     return render_template("404.html")
 
-@app.errorhandler(500)
-def page_not_found(e):
+def server_error(e):
     return render_template("500.html")
 
-# Name Page
-@app.route("/user", methods=["GET", "POST"])
-def user():
-    form = NamerForm()
-    name = None # Assigning None to show form when value none and when name entered by user then it would show the greet message
-
-    # Validating form
-    if form.validate_on_submit():
-        name = form.name.data
-        flash("Form Submitted Successfully!")
-        return render_template("user.html", form=form, name=name)
-    
-    else:
-        return render_template("user.html", form=form, name=name)
-    
-
-""" USER MANAGEMENT """
-# Admin User
-@app.route("/admin")
-def admin():
-    our_users = Users.query.order_by(Users.date_added)
-    posts = Posts.query.order_by(Posts.date_posted)
-    form = PostForm()
-    # Logic to say user ID 1 is admin ()
-        # Not the best way to do this but a hacky way
-    if current_user.id == 1:
-        return render_template("admin.html", 
-                               our_users=our_users, 
-                               posts=posts, 
-                               form=form)
-    else:
-        flash("You are not authorized to access this page...")
-        return redirect(url_for("dashboard"))
-
-
-# Add User Page (Shows how to add to DB)
-@app.route("/user/add", methods=["GET", "POST"])
-def add_user():
-    # Checking if user is already logged in
-    if current_user.is_authenticated:
-        if current_user.id == 1:
-            pass
-        else:
-            flash("Already logged in!")
-            return redirect(url_for('dashboard'))
-
-    form = UserForm()
-    our_users = Users.query.order_by(Users.date_added)
-
-    # Validating form
-    if form.validate_on_submit():
-        user = Users.query.filter_by(email=form.email.data).first() # Checking if current email exists
-
-        if user is None:    # if no existing users
-            # Hashing Pass
-            hashed_pw = generate_password_hash(form.password.data)
-
-            # Updating user with values from form
-            user = Users(name=form.name.data, 
-                         email=form.email.data,
-                         username=form.username.data,
-                         fav_color=form.fav_color.data,
-                         about_author=form.about_author.data,
-                         password_hash=hashed_pw)
-            
-            # Commiting to DB
-            db.session.add(user)
-            db.session.commit()
-
-            flash("User Added Successfully!")
-            if current_user.is_authenticated:   # Diff routing for admin
-                if current_user.id == 1:
-                    return redirect(url_for('admin'))
-            else:
-                return redirect(url_for("dashboard"))
-        
-        else:
-            flash("Already Registered!")
-            return redirect(url_for("add_user"))
-
-    
-    return render_template("add.html", form=form, our_users=our_users)
-
-
-# Update user route
-@app.route("/update/<int:id>", methods=["GET", "POST"])
-@login_required
-def update(id):
-    form = UserForm()
-    user_to_update = Users.query.get_or_404(id)
-    if request.method == "POST":
-        # Updating from values from the template
-        user_to_update.name = request.form["name"]
-        user_to_update.email = request.form["email"]
-        user_to_update.username = request.form["username"]
-        user_to_update.fav_color = request.form["fav_color"]
-        user_to_update.about_author = request.form["about_author"]
-        try:
-            db.session.commit()
-            flash("User Updated Successfully!!!")
-            return redirect(url_for("dashboard"))
-        except:
-            flash("User Update Failed!!! Try Again...")
-            return redirect(url_for("dashboard"))
-    else:
-        return render_template("update.html", 
-                               form=form, 
-                               id=id,
-                               user_to_update=user_to_update)
-    
-# Removing a user from db
-@app.route("/delete/<int:id>")
-@login_required
-def delete(id):
-    user_to_delete = Users.query.get_or_404(id)
-
-    if current_user.id == user_to_delete.id or current_user.id == 1:    
-        try:
-            db.session.delete(user_to_delete)
-            db.session.commit()
-            flash("User Deleted Successfully!!!")
-            if current_user.id == 1:
-                return redirect(url_for('admin'))
-            else:
-                return redirect(url_for("add_user"))
-        except:
-            flash("Failed to delete user! Try again...")
-            return redirect(url_for("add_user"))
-    else:
-        flash("Unauthorized to delete selected user!")
-        return redirect(url_for('dashboard'))
-
-
-""" LOGIN MANAGEMENT """
-# Login Route
-@app.route("/login", methods=["GET", "POST"])
-def login():
-    form=LoginForm()
-    # Validating form submission
-    if form.validate_on_submit():
-        # Querying db
-        user = Users.query.filter_by(username=form.username.data).first()
-        # Validating username
-        if user:
-            # Validating password
-            if check_password_hash(user.password_hash, form.password.data):
-                
-                # Logging in USER
-                login_user(user)
-                flash("Logged in successfully!")
-                return redirect(url_for("dashboard"))
-            else:
-                # redirect not needed for errors as user is staying on the same page
-                flash("Incorrect password! Try again...")
-        
-        # Logic for no username found 
-        else: 
-            flash("Username not found! Try again...")
-
-    # GET workflow
-    return render_template("login.html", form=form)
-
-# Dashboard/login page
-@app.route("/dashboard", methods=["GET", "POST"])
-@login_required 
-def dashboard():
-    # Don't need to send model to template current_user() has it 
-    form = UserForm()
-    user_to_update = Users.query.get_or_404(current_user.id)
-
-    # POST Workflow
-    if request.method == "POST":
-        # Updating values 
-        user_to_update.username = form.username.data
-        user_to_update.email = form.email.data
-        user_to_update.name = form.name.data
-        user_to_update.fav_color = form.fav_color.data
-        user_to_update.about_author = form.about_author.data
-        
-        # Saving image to var
-        uploaded_image = form.profile_pic.data
-            # Can use (request.files["profile_pic"]) OR form.profile_pic.data as well 
-
-        if uploaded_image:     # Checking for NULL profile pic
-            # Grab Image Name securely
-            pic_filename = secure_filename(uploaded_image.filename)
-            # Set UUID
-            pic_name = str(uuid.uuid1()) + "_" + pic_filename
-            # Change it to a string to save to db
-            user_to_update.profile_pic = pic_name
-
-        try:
-            # Saving image to folder
-            uploaded_image.save(os.path.join(app.config['UPLOAD_FOLDER'], pic_name))
-            # DB Commit
-            db.session.commit()
-            flash("Updated Successfully!")
-            return redirect(url_for("dashboard"))
-        except Exception as e:
-            flash(f"Update failed! Try again... | Error: {e}")
-            return redirect(url_for("dashboard"))
-            
-    # GET workflow
-    # form.fav_color.data = user_to_update.fav_color
-
-    return render_template("dashboard.html", form=form, user_to_update=user_to_update)
-
-# Logout route
-@app.route("/logout")
-@login_required
-def logout():
-    logout_user()   # Logs out current user
-    flash("Logged out successfully!")
-    return redirect(url_for("login"))
-
-
-""" TEST/TRY PAGES """
-# Test Password Page
-@app.route("/test_pw", methods=["GET", "POST"])
-def test_pw():
-    form = LoginForm()
-    username = None 
-    password = None
-    user_to_check = None
-    passed = None
-
-    # Will validate only if data entered and submitted
-    if form.validate_on_submit():
-        # Assigning values
-        username = form.username.data
-        password = form.password.data
-
-        """ Another form of logic where form submission is checked through a value being NULL
-        # form.email.data = ''
-        # form.password.data = ''
-        """
-        
-        # Querying db to check if email exists
-        user_to_check = Users.query.filter_by(username=username).first()
-
-        if user_to_check:
-            
-            # Checking if entered pass matches existing pass
-            passed = check_password_hash(user_to_check.password_hash, password)
-            
-            # Message and render
-            flash("User Found!")
-            return render_template("test_pw.html", form=form, username=username, user_to_check=user_to_check, passed=passed)
-        else:
-            flash("No user found!")
-            return redirect(url_for("test_pw"))
-    
-    return render_template("test_pw.html", form=form, username=username)
-
-# JSON Page
-@app.route("/test_date")
-def test_date():
-    return {"Date: ": datetime.now()}
-
-
-""" BLOG CRUD OPERATIONS """
-# CREATE Blog Post
-@app.route("/add-post", methods=["GET", "POST"])
-@login_required
-def add_post():
-    form = PostForm()
-    poster = current_user.id    # To get who is posting
-
-    if form.validate_on_submit():
-        # Creating a new post
-        post = Posts(title=form.title.data,  
-                     slug=form.slug.data, 
-                     content=form.content.data, 
-                     poster_id=poster)
-        
-        # Adding to db
-        db.session.add(post)
-        db.session.commit()
-
-        # Confirming user added & redirecting
-        flash("Blog posted successfully!")
-        # Good practice to use url_for() instead of hardcoding
-        return redirect(url_for("posts"))   
-    
-    return render_template("add_post.html", form=form)
-
-# READ - All Blogs
-@app.route("/posts")
-def posts():
-    # Adding form to allow deletion 
-        # Ideally this should be a seperate delete form to handle this
-    form = PostForm()
-    
-    # Getting all posts
-    posts = Posts.query.order_by(Posts.date_posted.desc()).all()
-    return render_template("posts.html", posts=posts, form=form)
-
-# READ - Individual blog
-@app.route("/posts/<int:id>")
-def post(id):
-    post = Posts.query.get_or_404(id)
-    return render_template("post.html", post=post)
-
-# UPDATE - Blog Post
-@app.route("/posts/edit/<int:id>", methods=["GET", "POST"])
-@login_required
-def edit_posts(id):
-    # Getting form and model
-    post_to_update = Posts.query.get_or_404(id)
-    form = PostForm()
-    # form = PostForm(obj=post_to_update)   # Pre-fills form with existing values
-
-    if post_to_update.poster_id == current_user.id or current_user.id == 1:
-        # POST workflow
-        if form.validate_on_submit():
-            # Updating Post (can be automated with populate_obj line below)
-            post_to_update.title = form.title.data
-            post_to_update.slug = form.slug.data
-            post_to_update.content = form.content.data
-            # form.populate_obj(post_to_update)     # Automatically assigns form data to model fields 
-
-            # Updating db
-            db.session.commit()
-
-            # Confirming and redirecting
-            flash("Blog post edited successfully!")
-            return redirect(url_for("posts"))
-        
-        # Adding values to form (can be automated with pre-fills line)
-        form.title.data = post_to_update.title
-        form.slug.data = post_to_update.slug
-        form.content.data = post_to_update.content
-
-        return render_template("edit_post.html", form=form, id=id)
-    
-    else:
-        flash("You are not authorized to edit this post! ")
-        return redirect(url_for("posts"))
-
-# DELETE - Blog Post 
-""" Changed to POST as GET should only be used in read-only ops"""
-@app.route("/posts/delete/<int:id>", methods=["POST"])
-@login_required
-def delete_posts(id):
-    post_to_delete = Posts.query.get_or_404(id)
-    poster_id = current_user.id
-
-    # Checking if current user is the same as poster
-    if poster_id == post_to_delete.poster_id or poster_id == 1:    
-        try:
-            # Deleting selected user
-            db.session.delete(post_to_delete)
-            db.session.commit()
-
-            # Confirm & redirect
-            flash("Blog post deleted successfully!")
-            return redirect(url_for("posts"))
-        except:
-            flash("Failed post deletion! Try again...")
-            # db.session.rollback()     # Clear failed transaction and resets the session
-            return redirect(url_for("posts"))
-    else:
-        flash("You are not authorized to delete this post!")
-        return redirect(url_for("posts"))
-    
-
-""" BLOG ACTIONS """
-# Search blog posts
-@app.route("/search", methods=["GET", "POST"])
-def search():
-    form = SearchForm()
-    post = Posts.query  # Getting all posts
-
-    if form.validate_on_submit():
-        
-        searched = form.searched.data
-        # Searching content field in DB
-        posts = post.filter(Posts.content.like('%'+searched+'%'))
-        posts = posts.order_by(Posts.title).all()
-
-        return render_template("search.html", form=form, posts=posts, searched=searched)
+# Password hash queue full, cheap answer so clients back off
+def hasher_busy(e):
+    return "Server busy, please try again shortly.", 503, {"Retry-After": "1"}
 
-    return render_template("search.html", form=form, searched=searched)
+# Over a rate limit, answered before the view did any work
+def too_many_requests(e):
+    return "Too many requests, please try again later.", 429, {"Retry-After": str(e.retry_after)}
 
 
 """ Best practice in production:
-    1. Wrap all commits in 
-        1a. try/except 
+    1. Wrap all commits in
+        1a. try/except
         1b. SQLAlchemyError).
     2. Rollback on failure.
     3. Log the exact error for debugging, but show a clean flash to the user
         3a. DELETE is most likely to fail, maybe a post is referenced by another table
-"""
\ No newline at end of file
+"""
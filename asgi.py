@@ -0,0 +1,212 @@
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import abort, render_template, request, request_started, session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from auth import session_user_statement
+from db_config import async_database_url, engine_options, tune_sqlite
+from extensions import db, metrics, profiler, user_cache
+from helpers import (conditional_response, feed_cursors, feed_statement, feed_validators, feed_versions_statement,
+                     post_statement, post_validators, post_versions_statement, rank_results, render_feed, render_post,
+                     render_search, search_statement)
+from session_store import DatabaseSessionStore, store_key
+from user_cache import SessionUser
+from webforms import SearchForm
+
+
+""" ASYNC SERVING MODE """
+# ASGI entry point: SERVER_MODE=async gunicorn (see gunicorn.conf.py) or "uvicorn asgi:application"
+    # The read routes (posts, post, search) run as coroutines on SQLAlchemy's async engine,
+    # a slow query only parks that request and the worker keeps serving the others
+    # Every other route is the regular Flask app, run in a thread by asgiref's WsgiToAsgi
+    # Same app, models, statements & templates as sync mode (see the read route steps in helpers.py)
+
+app = create_app()
+with app.app_context():
+    url = db.engine.url     # Relative SQLite paths already resolved to the instance folder
+    async_engine = create_async_engine(async_database_url(url), **engine_options(url.drivername))
+    tune_sqlite(async_engine.sync_engine)
+    profiler.watch(async_engine.sync_engine)
+    metrics.watch(async_engine.sync_engine)
+# Loaded objects stay usable after the session closes, templates read them after the queries
+Session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+wsgi_application = WsgiToAsgi(app)
+
+
+""" ASYNC VIEWS """
+# Mirror the sync routes in blog.py step for step, only the queries are awaited
+    # Anything lazy loaded in sync mode has to be loaded up front here (no IO outside an await)
+
+async def posts(db_session):
+    before, after = feed_cursors()
+    versions = (await db_session.execute(feed_versions_statement(before, after))).all()
+    etag = feed_validators(versions)
+    not_modified = conditional_response(etag)
+    if not_modified:
+        return not_modified
+
+    posts = (await db_session.scalars(feed_statement(before, after))).all()
+    for post in posts:
+        if post.excerpt is None:    # Not backfilled yet, the template falls back to the content
+            await db_session.refresh(post, ["content"])
+    return render_feed(posts, before, after, etag)
+
+async def post(db_session, id):
+    versions = (await db_session.execute(post_versions_statement(id))).first()
+    if versions is None:
+        abort(404)
+    etag = post_validators(id, versions)
+    not_modified = conditional_response(etag)
+    if not_modified:
+        return not_modified
+
+    post = (await db_session.scalars(post_statement(id))).first()
+    if post is None:
+        abort(404)
+    return render_post(post, etag)
+
+async def search(db_session):
+    form = SearchForm()
+    if form.validate_on_submit():
+        searched = form.searched.data
+        statement, ranked = search_statement(searched)
+        posts = rank_results((await db_session.scalars(statement)).all(), ranked) if statement is not None else []
+        return render_search(form, searched, posts)
+    return render_template("search.html", form=form, searched=None)
+
+ASYNC_VIEWS = {"blog.posts": posts, "blog.post": post, "blog.search": search}
+
+
+""" ASGI APP """
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http":
+        # Matched with Flask's own URL map, the async routes are exactly the sync ones
+        adapter = app.url_map.bind("localhost")
+        try:
+            endpoint, view_args = adapter.match(scope["path"], method=scope["method"])
+        except HTTPException:   # 404/405/redirects, Flask answers those
+            endpoint = None
+        if endpoint in ASYNC_VIEWS:
+            return await serve(ASYNC_VIEWS[endpoint], view_args, scope, receive, send)
+    return await wsgi_application(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_engine.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# What Flask's wsgi_app/full_dispatch_request do, with the view awaited in the request context
+    # before/after_request hooks, error handlers, session cookie & teardown all run as usual
+async def serve(view, view_args, scope, receive, send):
+    environ = build_environ(scope, await read_body(receive))
+    ctx = app.request_context(environ)
+    error = None
+    try:
+        ctx.push()
+        try:
+            request_started.send(app)
+            response = app.preprocess_request()
+            if response is None:
+                # Limits of the sync view (see rate_limit.py), the client's checked before any query
+                    # A local SQLite statement, short enough to run on the loop
+                name, methods, account = getattr(app.view_functions[request.endpoint], "rate_limit", (None, (), None))
+                limiter = app.extensions['rate_limiter'] if request.method in methods else None
+                if limiter:
+                    limiter.limit_client(name, account)
+                async with Session() as db_session:
+                    await load_server_session(db_session)
+                    await load_session_user(db_session)
+                    if limiter:
+                        limiter.limit_user(name)
+                    response = await view(db_session, **view_args)
+        except Exception as e:
+            response = app.handle_user_exception(e)
+        response = app.finalize_request(response)
+    except Exception as e:
+        error = e
+        response = app.handle_exception(e)
+    finally:
+        ctx.pop(error)
+
+    body = b"" if scope["method"] == "HEAD" else response.get_data()
+    # What app.wsgi_app's Compressor does for the other routes
+    compressor = app.extensions.get('compressor')
+    if body and compressor:
+        encoding = compressor.negotiate(environ.get("HTTP_ACCEPT_ENCODING", ""), response.status_code, response.headers)
+        if encoding:
+            body = compressor.compress(encoding, body)
+            response.headers["Content-Length"] = str(len(body))
+
+    await send({"type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in response.headers.items()]})
+    await send({"type": "http.response.body", "body": body})
+    response.close()
+
+
+# The server-side session would be read with the sync engine on first use, blocking the loop (see session_store.py)
+async def load_server_session(db_session):
+    server_session = session._get_current_object()
+    store = getattr(server_session, "store", None)
+    if isinstance(store, DatabaseSessionStore) and server_session.sid and not server_session.loaded:
+        row = (await db_session.execute(store.load_statement(store_key(server_session.sid)))).first()
+        server_session.fill((row.data, row.expires_at) if row else None)
+
+
+# Flask-Login's user_loader queries with the sync session, the user is put in its cache first
+async def load_session_user(db_session):
+    user_id = session.get("_user_id")
+    if user_id is None or user_cache.get(int(user_id)) is not None:
+        return
+    row = (await db_session.execute(session_user_statement(int(user_id)))).first()
+    if row is not None:
+        user_cache.set(SessionUser(*row))
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def build_environ(scope, body):
+    environ = {"REQUEST_METHOD": scope["method"],
+               "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+               "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+               "QUERY_STRING": scope["query_string"].decode("ascii"),
+               "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+               "SERVER_NAME": scope["server"][0] if scope.get("server") else "localhost",
+               "SERVER_PORT": str(scope["server"][1]) if scope.get("server") else "80",
+               "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+               "wsgi.version": (1, 0),
+               "wsgi.url_scheme": scope.get("scheme", "http"),
+               "wsgi.input": io.BytesIO(body),
+               "wsgi.errors": sys.stderr,
+               "wsgi.multithread": True,
+               "wsgi.multiprocess": True,
+               "wsgi.run_once": False}
+    for name, value in scope["headers"]:
+        name = name.decode("latin1").upper().replace("-", "_")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else "HTTP_" + name
+        value = value.decode("latin1")
+        if key in environ:  # Repeated header (HTTP/2 sends cookies one per header)
+            value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+        environ[key] = value
+    return environ
@@ -0,0 +1,164 @@
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+
+from extensions import db, login_manager, password_hasher, thumbnailer, user_cache
+from helpers import invalidate_author, sync_author_name
+from image_pipeline import store_upload
+from models import Users
+from rate_limit import failed_attempt, rate_limit
+from user_cache import SessionUser
+from webforms import LoginForm, UserForm
+
+
+""" LOGIN MANAGEMENT """
+bp = Blueprint("auth", __name__)
+
+# Loading users from Users model
+    # current_user is a cached SessionUser (id, username, name, is_admin), not a Users row
+    # Flask-Login then keeps it for the rest of the request
+def session_user_statement(user_id):
+    return db.select(Users.id, Users.username, Users.name).filter_by(id=user_id)
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.execute(session_user_statement(user_id)).first()
+        if row is None:
+            return None
+        user = SessionUser(*row)
+        user_cache.set(user)
+    return user
+
+
+# Login Route
+@bp.route("/login", methods=["GET", "POST"])
+@rate_limit("login", account="username")
+def login():
+    form=LoginForm()
+    # Validating form submission
+    if form.validate_on_submit():
+        # Querying db
+        user = Users.query.filter_by(username=form.username.data).first()
+        # Validating username
+        if user:
+            # Validating password
+            if password_hasher.check(user.password_hash, form.password.data):
+                # Upgrading hashes made with older settings while we have the password
+                if password_hasher.needs_rehash(user.password_hash):
+                    user.password_hash = password_hasher.hash(form.password.data)
+                    db.session.commit()
+
+                # Logging in USER
+                login_user(user)
+                flash("Logged in successfully!")
+                return redirect(url_for("auth.dashboard"))
+            else:
+                failed_attempt()    # Counted against the account (see rate_limit.py)
+                # redirect not needed for errors as user is staying on the same page
+                flash("Incorrect password! Try again...")
+
+        # Logic for no username found
+        else:
+            flash("Username not found! Try again...")
+
+    # GET workflow
+    return render_template("login.html", form=form)
+
+# Dashboard/login page
+@bp.route("/dashboard", methods=["GET", "POST"])
+@login_required
+def dashboard():
+    # current_user only has the slim cached record, the template uses user_to_update
+    form = UserForm()
+    user_to_update = Users.query.get_or_404(current_user.id)
+
+    # POST Workflow
+    if request.method == "POST":
+        # Updating values
+        user_to_update.username = form.username.data
+        user_to_update.email = form.email.data
+        user_to_update.name = form.name.data
+        user_to_update.fav_color = form.fav_color.data
+        user_to_update.about_author = form.about_author.data
+
+        # Saving image to var
+        uploaded_image = form.profile_pic.data
+            # Can use (request.files["profile_pic"]) OR form.profile_pic.data as well
+
+        try:
+            new_image = False
+            if uploaded_image:     # Checking for NULL profile pic
+                # Stored under its SHA-256 (streamed in chunks, capped), the same picture is kept once
+                    # Old pics are left for "flask gc-images" to remove once no user points at them
+                user_to_update.profile_pic, new_image = store_upload(uploaded_image,
+                                                                     current_app.config['UPLOAD_FOLDER'],
+                                                                     current_app.config['MAX_UPLOAD_BYTES'])
+            # DB Commit
+            sync_author_name(user_to_update.id, user_to_update.name)
+            db.session.commit()
+            invalidate_author(user_to_update.id)    # Author name/pic shown on their posts
+            user_cache.invalidate(user_to_update.id)
+            if new_image:   # Resizing left to the background thread
+                thumbnailer.submit(user_to_update.profile_pic)
+            flash("Updated Successfully!")
+            return redirect(url_for("auth.dashboard"))
+        except Exception as e:
+            flash(f"Update failed! Try again... | Error: {e}")
+            return redirect(url_for("auth.dashboard"))
+
+    # GET workflow
+    # form.fav_color.data = user_to_update.fav_color
+
+    return render_template("dashboard.html", form=form, user_to_update=user_to_update)
+
+# Logout route
+@bp.route("/logout")
+@login_required
+def logout():
+    logout_user()   # Logs out current user
+    flash("Logged out successfully!")
+    return redirect(url_for("auth.login"))
+
+
+""" TEST/TRY PAGES """
+# Test Password Page
+@bp.route("/test_pw", methods=["GET", "POST"])
+@rate_limit("test_pw", account="username")
+def test_pw():
+    form = LoginForm()
+    username = None
+    password = None
+    user_to_check = None
+    passed = None
+
+    # Will validate only if data entered and submitted
+    if form.validate_on_submit():
+        # Assigning values
+        username = form.username.data
+        password = form.password.data
+
+        """ Another form of logic where form submission is checked through a value being NULL
+        # form.email.data = ''
+        # form.password.data = ''
+        """
+
+        # Querying db to check if email exists
+        user_to_check = Users.query.filter_by(username=username).first()
+
+        if user_to_check:
+
+            # Checking if entered pass matches existing pass
+            passed = password_hasher.check(user_to_check.password_hash, password)
+            if not passed:
+                failed_attempt()
+
+            # Message and render
+            flash("User Found!")
+            return render_template("test_pw.html", form=form, username=username, user_to_check=user_to_check, passed=passed)
+        else:
+            flash("No user found!")
+            return redirect(url_for("auth.test_pw"))
+
+    return render_template("test_pw.html", form=form, username=username)
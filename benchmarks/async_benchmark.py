@@ -0,0 +1,93 @@
+""" ASYNC BENCHMARK """
+# Throughput of the read routes by number of open connections, SERVER_MODE sync vs async gunicorn
+    # python benchmarks/async_benchmark.py [--connections 8,32,128] [--seconds 10] [--workers 2]
+    #     [--posts 5000] [--url postgresql://...]
+    # Every connection sends one request at a time (Connection: close), as many as it can for --seconds
+    # Sync workers take one connection each, the rest wait in the listen backlog
+    # The gap grows with query latency, on a local SQLite the queries barely wait at all (try --url)
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.loadtest.clients import Gunicorn
+from benchmarks.loadtest.report import summarize
+from benchmarks.loadtest.seed import create_schema, seed
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def load(port, connections, seconds, paths):
+    deadline = time.perf_counter() + seconds
+    latencies = []
+    errors = 0
+
+    async def connection(index):
+        nonlocal errors
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, rng.choice(paths))
+            except (OSError, IndexError, ValueError):
+                status = None
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(index) for index in range(connections)))
+    return latencies, errors, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", default="8,32,128")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--url", help="Existing database (DATABASE_URL), used as is")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="async-benchmark-")
+    os.environ["DATABASE_URL"] = args.url or "sqlite:///" + os.path.join(folder, "benchmark.db")
+    from app import create_app
+    from extensions import db
+    from helpers import reconcile_counters
+
+    app = create_app()
+
+    with app.app_context():
+        if not args.url:
+            print(f"Seeding {args.users} users & {args.posts} posts...", file=sys.stderr)
+            create_schema(db)
+            seed(db, args.users, args.posts, app.config['PASSWORD_HASH_METHOD'])
+            reconcile_counters()
+        posts = db.session.scalar(db.select(db.func.max(db.metadata.tables["posts"].c.id)))
+        db.engine.dispose()
+
+    # Mostly single posts, the feed now & then
+    paths = ["/posts"] + [f"/posts/{id}" for id in random.Random(42).sample(range(1, posts + 1), min(posts, 99))]
+    for mode in ("sync", "async"):
+        server = Gunicorn(args.workers, 1, args.port, {"DATABASE_URL": os.environ["DATABASE_URL"]}, mode)
+        try:
+            asyncio.run(load(args.port, args.workers, 2, paths))   # Warm up every worker
+            for connections in map(int, args.connections.split(",")):
+                result = summarize(*asyncio.run(load(args.port, connections, args.seconds, paths)))
+                print(f"{mode:<6} {connections:>5} connections  {result['throughput_rps']:8.1f} req/s  "
+                      f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  {result['errors']} errors")
+        finally:
+            server.stop()
@@ -0,0 +1,80 @@
+""" COMPRESSION BENCHMARK """
+# Bytes on the wire & CPU per request for the HTML pages, by encoding and with/without MINIFY_HTML
+    # python benchmarks/compression_benchmark.py [--requests 200] [--users 50] [--posts 2000]
+    # In process (Flask test client), CPU is process time so the numbers don't depend on the network
+    # "compress ms" is the compression alone on the page's bytes, the rest of "cpu ms" is the app itself
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.loadtest.seed import PASSWORD, create_schema, seed
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def cpu_per_request(client, method, path, headers, data, requests):
+    start = time.process_time()
+    for _ in range(requests):
+        response = client.open(path, method=method, headers=headers, data=data)
+        response.get_data()     # Streamed pages are rendered & compressed while read
+    return (time.process_time() - start) / requests
+
+
+def compress_time(compressor, encoding, body, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        compressor.compress(encoding, body)
+    return (time.process_time() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="Per page and setting")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=2000)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="compression-benchmark-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(folder, "benchmark.db")
+    os.chdir(ROOT)
+    from app import create_app
+    from extensions import db
+    from helpers import reconcile_counters
+
+    settings = {"PASSWORD_HASH_WORKERS": 0, "WTF_CSRF_ENABLED": False, "PROFILER_HEADERS": False, "RATE_LIMIT_BACKEND": "off"}
+    apps = {minify: create_app({**settings, "MINIFY_HTML": minify}) for minify in (False, True)}
+    with apps[True].app_context():
+        print(f"Seeding {args.users} users & {args.posts} posts...", file=sys.stderr)
+        create_schema(db)
+        seed(db, args.users, args.posts, apps[True].config['PASSWORD_HASH_METHOD'])
+        reconcile_counters()
+        admin = db.session.scalar(db.select(db.metadata.tables["users"].c.username).where(db.metadata.tables["users"].c.id == 1))
+        post_id = db.session.scalar(db.select(db.func.max(db.metadata.tables["posts"].c.id)))
+
+    # (label, method, path, form data), the feed & post as a logged out visitor, admin is streamed
+    pages = [("feed", "GET", "/posts", None),
+             ("post", "GET", f"/posts/{post_id}", None),
+             ("search", "POST", "/search", {"searched": "flask database"}),
+             ("admin", "GET", "/admin", None)]
+    print(f"{'page':<8}{'minify':<8}{'encoding':<10}{'bytes':>9}{'saved':>8}{'cpu ms':>9}{'compress ms':>13}")
+    for label, method, path, data in pages:
+        baseline = None
+        for minify, app in apps.items():
+            client = app.test_client()
+            if label == "admin":
+                client.post("/login", data={"username": admin, "password": PASSWORD})
+            for encoding in ENCODINGS:
+                headers = {"Accept-Encoding": encoding}
+                body = client.open(path, method=method, headers=headers, data=data).get_data()   # Also warms caches
+                plain = client.open(path, method=method, headers={"Accept-Encoding": "identity"}, data=data).get_data()
+                baseline = baseline or len(body)
+                cpu = statistics.median(cpu_per_request(client, method, path, headers, data, max(1, args.requests // 5))
+                                        for _ in range(5))
+                compress = 0 if encoding == "identity" else compress_time(app.extensions['compressor'], encoding, plain, args.requests)
+                print(f"{label:<8}{'on' if minify else 'off':<8}{encoding:<10}{len(body):>9}"
+                      f"{1 - len(body) / baseline:>8.1%}{cpu * 1000:>9.2f}{compress * 1000:>13.3f}")
@@ -0,0 +1,80 @@
+""" DATABASE BENCHMARK """
+# Mixed read/write throughput from several processes (like gunicorn workers)
+    # python benchmarks/db_benchmark.py [--processes 4] [--seconds 5] [--write-ratio 0.1]
+    # SQLite runs on a temp file, pass --url postgresql://... to benchmark Postgres
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_config import engine_options, tune_sqlite
+
+
+def make_engine(url, profile):
+    if profile == "default":
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    tune_sqlite(engine)
+    return engine
+
+
+def worker(url, profile, seconds, write_ratio, results):
+    engine = make_engine(url, profile)
+    rng = random.Random(os.getpid())
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            with engine.begin() as connection:
+                if rng.random() < write_ratio:
+                    connection.execute(text("INSERT INTO bench_posts (title, content) VALUES (:t, :c)"),
+                                       {"t": "title", "c": "content " * 100})
+                    writes += 1
+                else:
+                    connection.execute(text("SELECT id, title, content FROM bench_posts ORDER BY id DESC LIMIT 10")).all()
+                    reads += 1
+        except OperationalError:    # "database is locked" and friends
+            errors += 1
+    results.put((reads, writes, errors))
+
+
+def run(url, profile, processes, seconds, write_ratio):
+    engine = make_engine(url, profile)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS bench_posts"))
+        connection.execute(text("CREATE TABLE bench_posts (id INTEGER PRIMARY KEY, title TEXT, content TEXT)"))
+        connection.execute(text("INSERT INTO bench_posts (title, content) VALUES (:t, :c)"),
+                           [{"t": "title", "c": "content " * 100}] * 1000)
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(url, profile, seconds, write_ratio, results))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    totals = [sum(column) for column in zip(*[results.get() for _ in workers])]
+    for process in workers:
+        process.join()
+
+    reads, writes, errors = totals
+    print(f"{profile:<8} {reads / seconds:10.0f} reads/s {writes / seconds:9.0f} writes/s {errors:6d} errors")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    for profile in ("default", "tuned"):
+        url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+        run(url, profile, args.processes, args.seconds, args.write_ratio)
@@ -0,0 +1,133 @@
+""" LOAD TEST """
+# Seeds a database and drives the real routes, p50/p95/p99 & throughput per route as JSON
+    # python -m benchmarks.loadtest [--users 200] [--posts 5000] [--requests 200] [--concurrency 4]
+    #     [--driver client|gunicorn] [--mode sync|async] [--workers 2] [--routes feed,post,...] [--output results.json]
+    #     [--baseline baseline.json] [--tolerance 0.2]
+    # Runs on a fresh temp SQLite database unless --url is given (seeded only with --seed)
+    # Keep a run as the baseline with --output, later runs with --baseline exit 1 on a regression
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .clients import ClientSession, Gunicorn, HttpSession
+from .report import compare, summarize
+from .scenarios import EXPECTED, SCENARIOS
+from .seed import ROOT, create_schema, seed
+
+
+def run_route(sessions, name, requests, volumes, label):
+    scenario = SCENARIOS[name]
+    share = -(-requests // len(sessions))
+
+    def virtual_user(index):
+        rng = random.Random(f"{label}-{name}-{index}")
+        session = sessions[index]
+        latencies = []
+        errors = 0
+        for _ in range(share):
+            method, path, data = scenario(session, rng, volumes)   # Untimed, may fetch a CSRF token
+            start = time.perf_counter()
+            status = session.request(method, path, data)
+            latencies.append(time.perf_counter() - start)
+            errors += status != EXPECTED[name]
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(sessions)) as pool:
+        results = list(pool.map(virtual_user, range(len(sessions))))
+    seconds = time.perf_counter() - start
+    return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200, help="Per route")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per route first")
+    parser.add_argument("--concurrency", type=int, default=4, help="Virtual users, each with its own session")
+    parser.add_argument("--routes", default="feed,post,search,login,add_post,dashboard")
+    parser.add_argument("--driver", choices=("client", "gunicorn"), default="client")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="gunicorn only, SERVER_MODE")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn only")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn only")
+    parser.add_argument("--port", type=int, default=8766, help="gunicorn only")
+    parser.add_argument("--url", help="Existing database (DATABASE_URL)")
+    parser.add_argument("--seed", action="store_true", help="Seed the --url database too")
+    parser.add_argument("--output", help="JSON file, stdout if not given")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Before the app is imported, it reads DATABASE_URL once
+    folder = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["DATABASE_URL"] = args.url or "sqlite:///" + os.path.join(folder, "loadtest.db")
+    os.environ["RATE_LIMIT_BACKEND"] = "off"    # A few clients from one IP, the limits would answer most with 429s
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from extensions import db
+    from helpers import reconcile_counters
+
+    app = create_app({"SEARCH_INDEX_PATH": os.path.join(folder, "search_index.pkl.gz")})
+    with app.app_context():
+        if not args.url or args.seed:
+            print(f"Seeding {args.users} users & {args.posts} posts...", file=sys.stderr)
+            create_schema(db)
+            seed(db, args.users, args.posts, app.config['PASSWORD_HASH_METHOD'])
+            reconcile_counters()
+        volumes = {"users": db.session.scalar(db.select(db.func.max(db.metadata.tables["users"].c.id))),
+                   "posts": db.session.scalar(db.select(db.func.max(db.metadata.tables["posts"].c.id)))}
+        db.engine.dispose()     # No connections carried into gunicorn's workers
+
+    server = None
+    if args.driver == "gunicorn":
+        server = Gunicorn(args.workers, args.threads, args.port, {"DATABASE_URL": os.environ["DATABASE_URL"]}, args.mode)
+        sessions = [HttpSession(server.base_url) for _ in range(args.concurrency)]
+    else:
+        sessions = [ClientSession(app) for _ in range(args.concurrency)]
+
+    routes = {}
+    try:
+        for index, session in enumerate(sessions):
+            session.login(f"user{index % volumes['users'] + 1}")
+        for name in args.routes.split(","):
+            if args.warmup:
+                run_route(sessions, name, args.warmup, volumes, label="warmup")
+            latencies, errors, seconds = run_route(sessions, name, args.requests, volumes, label="timed")
+            routes[name] = summarize(latencies, errors, seconds)
+            print(f"{name:<10} p50 {routes[name]['p50_ms']:8.2f} ms  p95 {routes[name]['p95_ms']:8.2f} ms  "
+                  f"p99 {routes[name]['p99_ms']:8.2f} ms  {routes[name]['throughput_rps']:8.1f} req/s  "
+                  f"{errors} errors", file=sys.stderr)
+    finally:
+        if server:
+            server.stop()
+
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "config": {key: getattr(args, key) for key in ("driver", "mode", "workers", "threads", "concurrency", "requests")},
+               "volumes": volumes,
+               "routes": routes}
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if (baseline["config"], baseline["volumes"]) != (results["config"], results["volumes"]):
+            print("Baseline was run with other settings, the comparison is only indicative", file=sys.stderr)
+        problems = compare(results, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import http.cookiejar
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from .seed import PASSWORD, ROOT
+
+
+""" CLIENTS """
+# One virtual user = one session with its own cookies, same interface for both drivers
+    # request(method, path, data) -> status code, redirects are not followed (a login is one request)
+    # Forms are posted with a real CSRF token, read once per session from the login page
+
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class Session:
+    csrf_token = None
+
+    def request(self, method, path, data=None):
+        raise NotImplementedError
+
+    def get_text(self, path):
+        raise NotImplementedError
+
+    def form(self, **fields):
+        if self.csrf_token is None:
+            self.csrf_token = CSRF_RE.search(self.get_text("/login")).group(1)
+        return {"csrf_token": self.csrf_token, **fields}
+
+    def login(self, username):
+        status = self.request("POST", "/login", self.form(username=username, password=PASSWORD))
+        if status != 302:
+            raise RuntimeError(f"Login as {username} failed ({status})")
+
+
+# Flask test client, in process (no network, no server)
+class ClientSession(Session):
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+    def get_text(self, path):
+        return self.client.get(path).get_data(as_text=True)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+# Real HTTP against a local server
+class HttpSession(Session):
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(NoRedirect(), urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, data=body, method=method)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:     # 3xx (not followed), 4xx, 5xx
+            error.read()
+            return error.code
+
+    def get_text(self, path):
+        with self.opener.open(self.base_url + path) as response:
+            return response.read().decode()
+
+
+# gunicorn serving the repo's app in SERVER_MODE sync or async (see gunicorn.conf.py), stopped with stop()
+class Gunicorn:
+    def __init__(self, workers, threads, port, env, mode="sync"):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", str(threads),
+                                         "-b", f"127.0.0.1:{port}"],
+                                        cwd=ROOT, env={**os.environ, **env, "SERVER_MODE": mode},
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                if self.process.poll() is not None:
+                    break
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("gunicorn did not start")
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
@@ -0,0 +1,40 @@
+import math
+
+
+""" REPORT """
+# Latencies per route -> JSON-ready summary, and the check against a stored baseline
+
+
+# Nearest rank on sorted values
+def percentile(values, fraction):
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(latencies, errors, seconds):
+    latencies = sorted(latencies)
+    return {"requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / seconds, 1),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2)}
+
+
+# Regressions as readable lines, empty when everything is within tolerance
+    # Slower p95/p99 or lower throughput by more than tolerance (0.2 = 20%), or any new errors
+def compare(results, baseline, tolerance):
+    problems = []
+    for route, old in baseline["routes"].items():
+        new = results["routes"].get(route)
+        if new is None:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if new[key] > old[key] * (1 + tolerance):
+                problems.append(f"{route}: {key} {old[key]} -> {new[key]}")
+        if new["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{route}: throughput_rps {old['throughput_rps']} -> {new['throughput_rps']}")
+        if new["errors"] > old["errors"]:
+            problems.append(f"{route}: errors {old['errors']} -> {new['errors']}")
+    return problems
@@ -0,0 +1,34 @@
+from .seed import PASSWORD, words
+
+
+""" SCENARIOS """
+# One request per call: scenario(session, rng, volumes) -> (method, path, form data)
+    # Volumes is {"users": n, "posts": n}, ids 1..n exist after seeding
+    # EXPECTED is the status a working app answers with, anything else counts as an error
+    # add_post & dashboard need the session logged in, every virtual user is
+
+
+def feed(session, rng, volumes):
+    return "GET", "/posts", None
+
+def post(session, rng, volumes):
+    return "GET", f"/posts/{rng.randint(1, volumes['posts'])}", None
+
+def search(session, rng, volumes):
+    return "POST", "/search", session.form(searched=" ".join(words(rng, rng.randint(1, 2))))
+
+def login(session, rng, volumes):
+    return "POST", "/login", session.form(username=f"user{rng.randint(1, volumes['users'])}", password=PASSWORD)
+
+def add_post(session, rng, volumes):
+    title = words(rng, 5)
+    return "POST", "/add-post", session.form(title=" ".join(title).title(),
+                                             slug="-".join(title[:3]),
+                                             content="<p>" + " ".join(words(rng, 300)) + "</p>")
+
+def dashboard(session, rng, volumes):
+    return "GET", "/dashboard", None
+
+
+SCENARIOS = {"feed": feed, "post": post, "search": search, "login": login, "add_post": add_post, "dashboard": dashboard}
+EXPECTED = {"feed": 200, "post": 200, "search": 200, "login": 302, "add_post": 302, "dashboard": 200}
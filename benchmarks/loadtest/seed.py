@@ -0,0 +1,92 @@
+import importlib.util
+import itertools
+import math
+import os
+import random
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from werkzeug.security import generate_password_hash
+
+from data_transfer import import_table
+from post_content import render_content
+
+
+""" SYNTHETIC DATA """
+# Users & posts with roughly real sizes and skew
+    # Post length is log-normal around MEDIAN_WORDS, split into <p> paragraphs like CKEditor output
+    # Authors follow a Zipf curve, a few users write most of the posts
+    # Every user logs in with PASSWORD (one hash shared by all, hashing thousands would take minutes)
+
+PASSWORD = "loadtest-pw"
+MEDIAN_WORDS = 400
+WORDS = ["flask", "python", "database", "index", "query", "template", "route", "login",
+         "session", "cache", "worker", "search", "blog", "post", "author", "profile",
+         "image", "upload", "request", "response"] + [f"word{n}" for n in range(5000)]
+WORD_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))   # Cumulative
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def words(rng, count):
+    return rng.choices(WORDS, cum_weights=WORD_WEIGHTS, k=count)
+
+def make_content(rng):
+    count = max(20, int(rng.lognormvariate(math.log(MEDIAN_WORDS), 0.6)))
+    text = words(rng, count)
+    paragraphs = []
+    while text:
+        size = rng.randint(40, 120)
+        paragraphs.append("<p>" + " ".join(text[:size]) + "</p>")
+        text = text[size:]
+    return "\n".join(paragraphs)
+
+
+def make_users(rng, count, password_hash):
+    for n in range(1, count + 1):
+        yield {"id": n,
+               "username": f"user{n}",
+               "name": " ".join(words(rng, 2)).title(),
+               "email": f"user{n}@example.com",
+               "fav_color": rng.choice(["red", "green", "blue", None]),
+               "about_author": " ".join(words(rng, rng.randint(10, 80))) if rng.random() < 0.5 else None,
+               "password_hash": password_hash}
+
+def make_posts(rng, count, users, names):
+    authors = range(1, users + 1)
+    author_weights = list(itertools.accumulate(1 / rank for rank in authors))
+    for n in range(1, count + 1):
+        title = words(rng, rng.randint(3, 9))
+        content = make_content(rng)
+        poster_id = rng.choices(authors, cum_weights=author_weights)[0]
+        yield {"id": n,
+               "title": " ".join(title).title(),
+               "slug": "-".join(title[:4]),
+               "content": content,
+               **render_content(content),   # As add_post stores them
+               "poster_id": poster_id,
+               "author_name": names[poster_id]}
+
+
+# Tables from the models plus the full-text search objects of the migration (SQLite FTS5 / Postgres GIN)
+    # "flask db upgrade" can't build a fresh database, the initial migration expects existing tables
+def create_schema(db):
+    db.create_all()
+    path = os.path.join(ROOT, "migrations", "versions", "3c9e1f0b7d24_posts_full_text_search.py")
+    spec = importlib.util.spec_from_file_location("posts_full_text_search", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+
+# Users' post_count/last_posted_at are left to reconcile_counters() (helpers.py)
+def seed(db, users, posts, password_method, seed=42):
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(PASSWORD, password_method)
+    records = list(make_users(rng, users, password_hash))
+    names = {user["id"]: user["name"] for user in records}
+    for _ in import_table(db.session, db.metadata.tables["users"], records):
+        pass
+    for _ in import_table(db.session, db.metadata.tables["posts"], make_posts(rng, posts, users, names), batch_size=2000):
+        pass
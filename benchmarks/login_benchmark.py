@@ -0,0 +1,46 @@
+""" LOGIN BENCHMARK """
+# Password checks per second in one app worker, hashing inline vs in the process pool
+    # python benchmarks/login_benchmark.py [--threads 4] [--workers 2] [--seconds 5]
+    # --threads mimics gunicorn gthread workers, with sync workers use --threads 1
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from password_hasher import PasswordHasher, HasherBusy
+
+
+def run(hasher, threads, seconds):
+    pw_hash = hasher.hash("correct horse")
+    deadline = time.perf_counter() + seconds
+
+    def login_loop():
+        done = rejected = 0
+        while time.perf_counter() < deadline:
+            try:
+                hasher.check(pw_hash, "correct horse")
+                done += 1
+            except HasherBusy:
+                rejected += 1
+        return done, rejected
+
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(lambda _: login_loop(), range(threads)))
+    return sum(r[0] for r in results) / seconds, sum(r[1] for r in results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    for label, workers in (("inline", 0), (f"pool x{args.workers}", args.workers)):
+        hasher = PasswordHasher(args.method, workers, args.max_pending)
+        per_second, rejected = run(hasher, args.threads, args.seconds)
+        print(f"{label:<12} {per_second:8.1f} logins/s  ({rejected} rejected with 503)")
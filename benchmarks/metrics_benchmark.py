@@ -0,0 +1,46 @@
+""" METRICS BENCHMARK """
+# Cost of the metric updates done for every request (see metrics.py)
+    # python benchmarks/metrics_benchmark.py [--iterations 100000]
+    # Runs once in memory and once in multiprocess (mmap) mode, as under gunicorn
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(iterations):
+    sys.path.insert(0, ROOT)
+    from metrics import CACHE_HITS, REQUEST_LATENCY, REQUESTS
+
+    endpoints = ["posts", "post", "search", "login", "dashboard"]
+    start = time.perf_counter()
+    for n in range(iterations):
+        endpoint = endpoints[n % len(endpoints)]
+        # What Metrics._finish does: one observe, one inc, one cache counter inc
+        REQUEST_LATENCY.labels(endpoint).observe(0.012)
+        REQUESTS.labels(endpoint, "GET", "200").inc()
+        CACHE_HITS.labels("fragment").inc(3)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        print(f"{measure(args.iterations):.2f}")
+        sys.exit()
+
+    # A fresh interpreter per mode, prometheus_client picks its storage at import time
+    for label, extra_env in (("in memory", {}), ("multiprocess", {"PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp()})):
+        env = {key: value for key, value in os.environ.items() if key != "PROMETHEUS_MULTIPROC_DIR"}
+        env.update(extra_env)
+        result = subprocess.run([sys.executable, __file__, "--child", "--iterations", str(args.iterations)],
+                                env=env, capture_output=True, text=True, check=True)
+        print(f"{label:<14} {result.stdout.strip():>8} µs per request")
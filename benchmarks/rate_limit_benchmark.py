@@ -0,0 +1,66 @@
+""" RATE LIMIT BENCHMARK """
+# Cost of a bucket check per store, and of a throttled login vs one that reaches the password check
+    # python benchmarks/rate_limit_benchmark.py [--checks 20000] [--requests 50]
+    # In process (Flask test client), one client so the login bucket empties after RATE_LIMITS["login"]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.loadtest.seed import PASSWORD, create_schema, seed
+
+
+# Microseconds per check, each on a bucket of its own (an insert) then again on the same ones (an update)
+def check_time(limiter, checks):
+    times = []
+    for label in ("new", "existing"):
+        start = time.perf_counter()
+        for n in range(checks):
+            limiter.hit("search", f"ip:{n}")
+        times.append((label, (time.perf_counter() - start) / checks * 1e6))
+    return times
+
+
+def request_ms(client, requests, status):
+    seconds = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.post("/login", data={"username": "user1", "password": PASSWORD})
+        seconds.append(time.perf_counter() - start)
+        assert response.status_code == status, response.status_code
+    return statistics.median(seconds) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="rate-limit-benchmark-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(folder, "benchmark.db")
+    os.chdir(ROOT)
+    from app import create_app
+    from extensions import db
+
+    settings = {"PASSWORD_HASH_WORKERS": 0, "WTF_CSRF_ENABLED": False, "RATE_LIMIT_PATH": os.path.join(folder, "rate_limits.db"),
+                "RATE_LIMITS": {"search": (10 ** 9, 1), "login": (args.requests, 60 * 60)}}
+    apps = {backend: create_app({**settings, "RATE_LIMIT_BACKEND": backend}) for backend in ("sqlite", "memory")}
+    with apps["sqlite"].app_context():
+        create_schema(db)
+        seed(db, 5, 10, apps["sqlite"].config['PASSWORD_HASH_METHOD'])
+
+    for backend, app in apps.items():
+        for label, micros in check_time(app.extensions['rate_limiter'], args.checks):
+            print(f"{backend:<8}check, {label + ' bucket':<16}{micros:8.1f} us")
+
+    # Same login, through to the password check while the bucket lasts, then answered 429
+    client = apps["sqlite"].test_client()
+    allowed = request_ms(client, args.requests, 302)
+    throttled = request_ms(client, args.requests, 429)
+    print(f"login with a password check {allowed:8.2f} ms")
+    print(f"login throttled (429)       {throttled:8.2f} ms")
@@ -0,0 +1,73 @@
+""" RENDER BENCHMARK """
+# Time to render the feed page with its CSRF fields: csrf_input() vs the FlaskForms it replaced
+    # python benchmarks/render_benchmark.py [--posts 500] [--renders 50]
+    # Rendered for the admin, so every row has its delete button & token
+    # "forms" is the old path: a SearchForm built by the context processor on every render,
+    # a PostForm from the view and form.hidden_tag() for the search box & each delete button
+    # The same template is used for both, the old path only swaps csrf_input for hidden_tag
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.loadtest.seed import create_schema, seed
+
+
+def render_new(posts):
+    return render_template("posts.html", posts=posts, next_cursor=None, prev_cursor=None)
+
+def render_forms(posts):
+    SearchForm()    # The old base() context processor
+    form = PostForm()
+    return render_template("posts.html", posts=posts, next_cursor=None, prev_cursor=None, form=form,
+                           csrf_input=form.hidden_tag)
+
+
+# Median ms per render, each in a request of its own (one CSRF token per request for both)
+def timed(render, app, admin, posts, renders):
+    seconds = []
+    for _ in range(renders):
+        with app.test_request_context("/posts"):
+            login_user(admin)
+            start = time.perf_counter()
+            render(posts)
+            seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--renders", type=int, default=50)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="render-benchmark-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(folder, "benchmark.db")
+    os.chdir(ROOT)
+    from flask import render_template
+    from flask_login import login_user
+    from app import create_app
+    from extensions import db
+    from helpers import feed_statement
+    from models import Users
+    from webforms import PostForm, SearchForm
+
+    app = create_app({"PASSWORD_HASH_WORKERS": 0, "POSTS_PER_PAGE": args.posts})
+    with app.app_context():
+        create_schema(db)
+        seed(db, 20, args.posts, app.config['PASSWORD_HASH_METHOD'])
+        admin = db.session.get(Users, 1)
+        posts = db.session.scalars(feed_statement(None, None)).all()[:args.posts]
+        db.session.expunge_all()    # Used as loaded in every request below
+
+    for render in (render_forms, render_new):   # Warming the template & fragment caches
+        timed(render, app, admin, posts, 3)
+    forms = timed(render_forms, app, admin, posts, args.renders)
+    new = timed(render_new, app, admin, posts, args.renders)
+    print(f"{len(posts)} post feed, median of {args.renders} renders")
+    print(f"  forms       {forms:8.2f} ms")
+    print(f"  csrf_input  {new:8.2f} ms  ({forms - new:.2f} ms, {1 - new / forms:.0%} saved per render)")
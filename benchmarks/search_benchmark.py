@@ -0,0 +1,74 @@
+""" SEARCH BENCHMARK """
+# Compares the old LIKE scan against the in-process SearchIndex
+    # python benchmarks/search_benchmark.py [--sizes 10000,100000,1000000]
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search_index import SearchIndex
+
+
+# Small vocabulary with a skewed distribution, roughly like real text
+WORDS = ["flask", "python", "database", "index", "query", "template", "route", "login",
+         "session", "cache", "worker", "search", "blog", "post", "author", "profile",
+         "image", "upload", "request", "response"] + [f"word{n}" for n in range(5000)]
+QUERIES = ["flask", "database index", "word42", "templ*", "word4999 session"]
+
+
+def make_post(rng):
+    words = rng.choices(WORDS, weights=[1 / (rank + 1) for rank in range(len(WORDS))], k=120)
+    title = " ".join(words[:5]).title()
+    return title, "-".join(words[:3]), "<p>" + " ".join(words) + "</p>"
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(size, repeat):
+    rng = random.Random(size)
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE posts (id INTEGER PRIMARY KEY, title TEXT, slug TEXT, content TEXT)")
+    index = SearchIndex()
+
+    for start in range(0, size, 10000):
+        rows = [(post_id, *make_post(rng)) for post_id in range(start + 1, min(start + 10000, size) + 1)]
+        connection.executemany("INSERT INTO posts VALUES (?, ?, ?, ?)", rows)
+
+    build_start = time.perf_counter()
+    for post_id, title, slug, content in connection.execute("SELECT * FROM posts"):
+        index.add(post_id, title, slug, content)
+    build_seconds = time.perf_counter() - build_start
+
+    snapshot = os.path.join(tempfile.mkdtemp(), "index.pkl.gz")
+    index.save(snapshot, "benchmark")
+    load_start = time.perf_counter()
+    with open(snapshot, "rb") as file:
+        SearchIndex.load(file)
+    load_seconds = time.perf_counter() - load_start
+
+    print(f"\n{size} posts | build {build_seconds:.1f}s | snapshot {os.path.getsize(snapshot) / 1e6:.1f} MB, load {load_seconds:.1f}s")
+    print(f"{'query':<20}{'LIKE ms':>12}{'index ms':>12}")
+    for query in QUERIES:
+        pattern = "%" + query.rstrip("*") + "%"
+        like_ms = timed(lambda: connection.execute(
+            "SELECT id FROM posts WHERE content LIKE ? ORDER BY title", (pattern,)).fetchall(), repeat)
+        index_ms = timed(lambda: index.search(query), repeat)
+        print(f"{query:<20}{like_ms:>12.2f}{index_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes.split(","):
+        run(int(size), args.repeat)
@@ -0,0 +1,114 @@
+""" STARTUP BENCHMARK """
+# Cold start time of the app & the CLI, and memory per gunicorn worker with and without --preload
+    # python benchmarks/startup_benchmark.py [--runs 5] [--workers 4] [--requests 200]
+    # Memory is read from /proc (Linux only) once every worker has served some requests
+    # RSS counts shared pages in full for every worker, PSS splits them between the processes sharing them
+    # and USS is what a worker holds alone (what an extra worker really costs)
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.loadtest.seed import create_schema, seed
+
+
+def timed_runs(command, runs, env):
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+# kB from /proc/<pid>/smaps_rollup
+def memory(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as file:
+        return [int(child) for child in file.read().split()]
+
+
+def serve(preload, workers, requests, port, env):
+    # Gunicorn's own settings only, so --preload is the one difference (gunicorn.conf.py turns it on)
+    command = [sys.executable, "-m", "gunicorn", "-c", os.devnull, "-w", str(workers), "-b", f"127.0.0.1:{port}"]
+    if preload:
+        command.append("--preload")
+    start = time.perf_counter()
+    process = subprocess.Popen(command + ["app:create_app()"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:     # Up once a worker answers
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/posts").read()
+                break
+            except OSError:
+                if time.perf_counter() - start > 60:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.05)
+        ready = time.perf_counter() - start
+        for _ in range(requests):
+            for path in ("/posts", "/posts/1", "/login"):
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{path}").read()
+        worker_memory = [memory(pid) for pid in children(process.pid)]
+        return ready, memory(process.pid), worker_memory
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Warm up requests per path before measuring")
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="startup-benchmark-")
+    env = {**os.environ,
+           "DATABASE_URL": "sqlite:///" + os.path.join(folder, "startup.db"),
+           "PROMETHEUS_MULTIPROC_DIR": os.path.join(folder, "metrics")}
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+    os.environ.update(env)
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        create_schema(db)
+        seed(db, 50, 500, app.config['PASSWORD_HASH_METHOD'])
+        db.engine.dispose()
+
+    python = [sys.executable, "-c"]
+    flask = [sys.executable, "-m", "flask", "--app", "app"]
+    print("Cold start (median of %d runs)" % args.runs)
+    for label, command in (("python (interpreter only)", python + ["pass"]),
+                           ("import app", python + ["import app"]),
+                           ("create_app()", python + ["import app; app.create_app()"]),
+                           ("flask routes", flask + ["routes"]),
+                           ("flask db heads", flask + ["db", "heads"])):
+        print(f"  {label:<26} {timed_runs(command, args.runs, env) * 1000:8.0f} ms")
+
+    for preload in (False, True):
+        ready, master, workers = serve(preload, args.workers, args.requests, args.port, env)
+        total = sum(worker["pss"] for worker in workers) + master["pss"]
+        print(f"gunicorn -w {args.workers}{' --preload' if preload else ''}: first answer after {ready * 1000:.0f} ms, "
+              f"{total / 1024:.1f} MB PSS in total")
+        print(f"  master    RSS {master['rss'] / 1024:6.1f} MB  PSS {master['pss'] / 1024:6.1f} MB  USS {master['uss'] / 1024:6.1f} MB")
+        for worker in workers:
+            print(f"  worker    RSS {worker['rss'] / 1024:6.1f} MB  PSS {worker['pss'] / 1024:6.1f} MB  USS {worker['uss'] / 1024:6.1f} MB")
@@ -0,0 +1,80 @@
+""" EXPORT / IMPORT BENCHMARK """
+# Times "flask import" & "flask export" on a temp SQLite database
+    # python benchmarks/transfer_benchmark.py [--posts 1000000] [--users 1000] [--plain-passwords 50] [--fts]
+    # --fts adds the full-text search trigger from the migrations, every imported post is indexed too
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+folder = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(folder, "bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from extensions import db
+
+app = create_app()
+
+
+WORDS = ["flask", "python", "database", "index", "query", "template", "route", "login",
+         "session", "cache", "worker", "search", "blog", "post"] + [f"word{n}" for n in range(2000)]
+
+
+def write_files(users, plain_passwords, posts):
+    rng = random.Random(42)
+    users_path = os.path.join(folder, "users.jsonl")
+    posts_path = os.path.join(folder, "posts.jsonl")
+    with open(users_path, "w") as out:
+        for n in range(1, users + 1):
+            record = {"id": n, "username": f"user{n}", "name": f"User {n}", "email": f"user{n}@example.com"}
+            if n <= plain_passwords:
+                record["password"] = f"secret{n}"
+            else:
+                record["password_hash"] = "scrypt:32768:8:1$salt$" + "0" * 128
+            out.write(json.dumps(record) + "\n")
+    with open(posts_path, "w") as out:
+        for n in range(1, posts + 1):
+            words = rng.choices(WORDS, k=60)
+            out.write(json.dumps({"id": n, "title": " ".join(words[:5]), "slug": "-".join(words[:3]),
+                                  "content": "<p>" + " ".join(words) + "</p>", "poster_id": rng.randint(1, users),
+                                  "date_posted": f"2026-01-01T00:00:{n % 60:02d}"}) + "\n")
+    return users_path, posts_path
+
+
+def timed(runner, *args):
+    start = time.perf_counter()
+    result = runner.invoke(args=list(args))
+    if result.exit_code:
+        sys.exit(result.output)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--plain-passwords", type=int, default=50)
+    parser.add_argument("--fts", action="store_true")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        if args.fts:
+            db.session.execute(db.text("CREATE VIRTUAL TABLE posts_fts USING fts5(title, slug, content, "
+                                       "content='posts', content_rowid='id')"))
+            db.session.execute(db.text("CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN "
+                                       "INSERT INTO posts_fts(rowid, title, slug, content) "
+                                       "VALUES (new.id, new.title, new.slug, new.content); END"))
+            db.session.commit()
+
+    users_path, posts_path = write_files(args.users, args.plain_passwords, args.posts)
+    runner = app.test_cli_runner()
+    results = [("import users", args.users, timed(runner, "import", "users", users_path)),
+               ("import posts", args.posts, timed(runner, "import", "posts", posts_path)),
+               ("export posts jsonl", args.posts, timed(runner, "export", "posts", os.path.join(folder, "out.jsonl"))),
+               ("export posts csv", args.posts, timed(runner, "export", "posts", os.path.join(folder, "out.csv")))]
+    for name, rows, seconds in results:
+        print(f"{name:<20} {rows:>9} rows {seconds:8.2f} s {rows / seconds:10.0f} rows/s")
@@ -0,0 +1,170 @@
+from datetime import datetime
+from flask import Blueprint, abort, flash, redirect, render_template, url_for
+from flask_ckeditor import CKEditor
+from flask_login import current_user, login_required
+
+from extensions import db, fragment_cache
+from helpers import (conditional_response, count_post, csrf_valid, feed_cursors, feed_statement, feed_validators,
+                     feed_versions_statement, fulltext_search, index_post, post_statement, post_validators,
+                     post_versions_statement, render_feed, render_post, render_search, uncount_post, unindex_post)
+from models import Posts
+from rate_limit import rate_limit
+from webforms import PostForm, SearchForm
+
+
+""" BLOG CRUD OPERATIONS """
+bp = Blueprint("blog", __name__)
+
+# Rich Text Editor, set up when this blueprint is registered (only the add & edit post pages use it)
+@bp.record_once
+def init_ckeditor(state):
+    CKEditor(state.app)
+
+# CREATE Blog Post
+@bp.route("/add-post", methods=["GET", "POST"])
+@login_required
+def add_post():
+    form = PostForm()
+    poster = current_user.id    # To get who is posting
+
+    if form.validate_on_submit():
+        # Creating a new post
+        date_posted = datetime.now()
+        post = Posts(title=form.title.data,
+                     slug=form.slug.data,
+                     poster_id=poster,
+                     date_posted=date_posted)
+        post.set_content(form.content.data)     # Sanitized HTML, excerpt & reading time
+        post.author_name = count_post(poster, date_posted)
+
+        # Adding to db
+        db.session.add(post)
+        db.session.commit()
+        index_post(post)
+
+        # Confirming user added & redirecting
+        flash("Blog posted successfully!")
+        # Good practice to use url_for() instead of hardcoding
+        return redirect(url_for("blog.posts"))
+
+    return render_template("add_post.html", form=form)
+
+# READ - All Blogs
+@bp.route("/posts")
+def posts():
+    before, after = feed_cursors()
+    versions = db.session.execute(feed_versions_statement(before, after)).all()
+    etag = feed_validators(versions)
+    not_modified = conditional_response(etag)
+    if not_modified:
+        return not_modified
+
+    posts = db.session.scalars(feed_statement(before, after)).all()
+    return render_feed(posts, before, after, etag)
+
+# READ - Individual blog
+@bp.route("/posts/<int:id>")
+def post(id):
+    versions = db.session.execute(post_versions_statement(id)).first()
+    if versions is None:
+        abort(404)
+    etag = post_validators(id, versions)
+    not_modified = conditional_response(etag)
+    if not_modified:
+        return not_modified
+
+    post = db.session.scalars(post_statement(id)).first()
+    if post is None:
+        abort(404)
+    return render_post(post, etag)
+
+# UPDATE - Blog Post
+@bp.route("/posts/edit/<int:id>", methods=["GET", "POST"])
+@login_required
+def edit_posts(id):
+    # Getting form and model
+    post_to_update = Posts.query.get_or_404(id)
+    form = PostForm()
+    # form = PostForm(obj=post_to_update)   # Pre-fills form with existing values
+
+    if post_to_update.poster_id == current_user.id or current_user.id == 1:
+        # POST workflow
+        if form.validate_on_submit():
+            # Updating Post (can be automated with populate_obj line below)
+            post_to_update.title = form.title.data
+            post_to_update.slug = form.slug.data
+            post_to_update.set_content(form.content.data)
+            # form.populate_obj(post_to_update)     # Automatically assigns form data to model fields
+
+            # Updating db
+            db.session.commit()
+            index_post(post_to_update)
+            fragment_cache.invalidate(post_to_update.id)
+
+            # Confirming and redirecting
+            flash("Blog post edited successfully!")
+            return redirect(url_for("blog.posts"))
+
+        # Adding values to form (can be automated with pre-fills line)
+        form.title.data = post_to_update.title
+        form.slug.data = post_to_update.slug
+        form.content.data = post_to_update.content
+
+        return render_template("edit_post.html", form=form, id=id)
+
+    else:
+        flash("You are not authorized to edit this post! ")
+        return redirect(url_for("blog.posts"))
+
+# DELETE - Blog Post
+""" Changed to POST as GET should only be used in read-only ops"""
+@bp.route("/posts/delete/<int:id>", methods=["POST"])
+@login_required
+def delete_posts(id):
+    # Token from csrf_input(), the delete buttons have no FlaskForm to check it
+    if not csrf_valid():
+        flash("Form expired, please try again!")
+        return redirect(url_for("blog.posts"))
+    post_to_delete = Posts.query.get_or_404(id)
+    poster_id = current_user.id
+
+    # Checking if current user is the same as poster
+    if poster_id == post_to_delete.poster_id or poster_id == 1:
+        try:
+            # Deleting selected user
+            db.session.delete(post_to_delete)
+            db.session.flush()
+            uncount_post(post_to_delete.poster_id)
+            db.session.commit()
+            unindex_post(id)
+            fragment_cache.invalidate(id)
+
+            # Confirm & redirect
+            flash("Blog post deleted successfully!")
+            return redirect(url_for("blog.posts"))
+        except:
+            flash("Failed post deletion! Try again...")
+            # db.session.rollback()     # Clear failed transaction and resets the session
+            return redirect(url_for("blog.posts"))
+    else:
+        flash("You are not authorized to delete this post!")
+        return redirect(url_for("blog.posts"))
+
+
+""" BLOG ACTIONS """
+# Search blog posts
+@bp.route("/search", methods=["GET", "POST"])
+@rate_limit("search")
+def search():
+    form = SearchForm()
+    searched = None
+
+    if form.validate_on_submit():
+
+        searched = form.searched.data
+        # Searching title, slug & content through the full-text index, best match first
+        posts = fulltext_search(searched)
+
+        return render_search(form, searched, posts)
+
+    return render_template("search.html", form=form, searched=searched)
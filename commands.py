@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+
+from data_transfer import (FORMATS, export_table, guess_format, import_table, password_hashing, post_dating, read_records,
+                           reset_id_sequence)
+from extensions import db
+from helpers import get_search_index, reconcile_counters, reset_search_index
+from image_pipeline import collect_garbage, scrub_originals
+from models import Posts, Users
+from post_content import render_content
+from session_store import ServerSessionInterface
+from static_assets import build
+
+import click
+import os
+
+
+""" CLI COMMANDS """
+# Added to "flask" by create_app (see COMMANDS)
+
+# flask gc-images [--grace-hours 24] [--dry-run]
+@click.command("gc-images")
+@with_appcontext
+@click.option("--grace-hours", default=24.0, help="Keep files newer than this, uploads may not be committed yet.")
+@click.option("--dry-run", is_flag=True, help="Only list what would be removed.")
+def gc_images(grace_hours, dry_run):
+    """Remove stored profile pics that no user references anymore."""
+    referenced = set(db.session.scalars(db.select(Users.profile_pic).where(Users.profile_pic.isnot(None)).distinct()))
+    removed = collect_garbage(current_app.config['UPLOAD_FOLDER'], 
+                              current_app.config['THUMBNAIL_FOLDER'], 
+                              referenced, 
+                              grace_hours * 60 * 60, 
+                              dry_run=dry_run)
+    for key in removed:
+        click.echo(key)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} unreferenced image(s)")
+
+
+# flask scrub-images
+@click.command("scrub-images")
+@with_appcontext
+def scrub_images():
+    """Strip EXIF & other metadata from profile pics stored before uploads were re-encoded."""
+    scrubbed, unreadable = scrub_originals(current_app.config['UPLOAD_FOLDER'], current_app.config['THUMBNAIL_FOLDER'])
+    for key in unreadable:
+        click.echo(f"Unreadable, left as is: {key}", err=True)
+    click.echo(f"Scrubbed {len(scrubbed)} image(s)")
+
+
+# flask backfill-content [--all] [--batch-size 500]
+@click.command("backfill-content")
+@with_appcontext
+@click.option("--all", "everything", is_flag=True, help="Redo every post (e.g. after changing the sanitizer), not only missing ones.")
+@click.option("--batch-size", default=500, help="Posts per transaction.")
+def backfill_content(everything, batch_size):
+    """Compute the sanitized HTML, excerpt & reading time of existing posts."""
+    last_id = 0
+    done = 0
+    while True:
+        query = db.select(Posts.id, Posts.content).where(Posts.id > last_id).order_by(Posts.id).limit(batch_size)
+        if not everything:
+            # "" too, older CSV imports turned NULL into ""
+            query = query.where(db.or_(Posts.content_html.is_(None), Posts.content_html == ""))
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        # New date_updated rolls over the cached fragments & ETags of these posts
+        now = datetime.now()
+        db.session.execute(db.update(Posts), [{"id": post_id, "date_updated": now, **render_content(content)} 
+                                              for post_id, content in rows])
+        db.session.commit()
+        last_id = rows[-1].id
+        done += len(rows)
+        click.echo(f"\r{done} posts rendered", nl=False, err=True)
+    click.echo(err=True)
+    click.echo(f"Backfilled {done} posts")
+
+# flask reconcile-counters [--dry-run]
+    # Safe to run any time (e.g. nightly), it only writes rows that drifted
+@click.command("reconcile-counters")
+@with_appcontext
+@click.option("--dry-run", is_flag=True, help="Only count the rows that drifted.")
+def reconcile_counters_command(dry_run):
+    """Recompute Users.post_count/last_posted_at and Posts.author_name from the source rows."""
+    users, posts = reconcile_counters(dry_run)
+    click.echo(f"{'Drifted' if dry_run else 'Repaired'}: {users} user counter(s), {posts} post author name(s)")
+
+# Tables moved by export/import, in the order to import them (posts need their users)
+TRANSFER_TABLES = {"users": Users.__table__, "posts": Posts.__table__}
+
+# flask export users users.jsonl | flask export posts posts.csv | flask export posts > posts.jsonl
+@click.command("export")
+@with_appcontext
+@click.argument("table", type=click.Choice(list(TRANSFER_TABLES)))
+@click.argument("path", default="-")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Default from the file extension, jsonl for stdout.")
+@click.option("--batch-size", default=1000, help="Rows fetched per round trip.")
+def export_data(table, path, fmt, batch_size):
+    """Write every row of a table to a JSONL or CSV file."""
+    with click.open_file(path, "w", encoding="utf-8") as out:
+        count = export_table(db.session, TRANSFER_TABLES[table], out, guess_format(path, fmt), batch_size)
+    click.echo(f"Exported {count} {table}", err=True)
+
+# flask import users users.jsonl [--hash-workers 8] | flask import posts posts.csv [--batch-size 10000]
+    # Users may carry a plain "password" instead of password_hash, it's hashed on import
+@click.command("import")
+@with_appcontext
+@click.argument("table", type=click.Choice(list(TRANSFER_TABLES)))
+@click.argument("path", default="-")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Default from the file extension, jsonl for stdin.")
+@click.option("--batch-size", default=10000, help="Rows per insert & transaction.")
+@click.option("--hash-workers", default=os.cpu_count(), help="Processes hashing plain passwords, 0 hashes inline.")
+def import_data(table, path, fmt, batch_size, hash_workers):
+    """Insert the rows of a JSONL or CSV file (as written by export) into a table."""
+    executor = ProcessPoolExecutor(hash_workers) if table == "users" and hash_workers else None
+    prepare = None
+    if table == "users":
+        prepare = password_hashing(current_app.config['PASSWORD_HASH_METHOD'], executor.map if executor else map)
+    elif table == "posts":
+        prepare = post_dating(datetime.now())
+
+    count = 0
+    try:
+        with click.open_file(path, encoding="utf-8") as file:
+            fmt = guess_format(path, fmt)
+            for count in import_table(db.session, TRANSFER_TABLES[table], read_records(file, fmt), batch_size, prepare, fmt):
+                click.echo(f"\r{count} {table} imported", nl=False, err=True)
+    except (IntegrityError, ValueError) as error:
+        # Only the driver's message, the full error lists the whole batch (password hashes included)
+        raise click.ClickException(f"Stopped after {count} {table}, the failing batch was rolled back: "
+                                   f"{getattr(error, 'orig', error)}")
+    finally:
+        if executor:
+            executor.shutdown()
+        click.echo(err=True)
+
+    reset_id_sequence(db.session, TRANSFER_TABLES[table])
+    if table == "posts" and current_app.config['SEARCH_BACKEND'] == "memory":
+        # Rebuilding the snapshot, workers pick it up on their next search
+        reset_search_index()
+        get_search_index()
+    click.echo(f"Imported {count} {table}")
+    if table == "posts":
+        # Not done here, rewriting every post's author_name also rolls over every cached fragment & ETag
+        click.echo("Files without author_name/post_count columns need 'flask reconcile-counters' afterwards")
+
+# flask build-static (on deploy, before the workers start)
+@click.command("build-static")
+@with_appcontext
+def build_static():
+    """Copy static files under content hashed names with gzip & brotli versions, see static_assets.py."""
+    # Uploaded pics & their thumbnails live below the upload folder, they have their own route
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    uploads = [os.path.join(upload_folder, name) for name in os.listdir(upload_folder)
+               if os.path.isdir(os.path.join(upload_folder, name))] if os.path.isdir(upload_folder) else []
+    manifest = build(current_app.static_folder, current_app.config['STATIC_BUILD_FOLDER'], exclude=uploads)
+    for filename, entry in manifest.items():
+        sizes = "".join(f", {encoding} {size}" for encoding, size in entry["encodings"].items())
+        click.echo(f"{filename} -> {entry['file']} ({entry['size']} bytes{sizes})")
+    click.echo(f"Built {len(manifest)} file(s) into {current_app.config['STATIC_BUILD_FOLDER']}")
+
+# flask purge-sessions (e.g. from cron, workers also do it every SESSION_PURGE_INTERVAL)
+@click.command("purge-sessions")
+@with_appcontext
+def purge_sessions():
+    """Delete expired server-side sessions."""
+    if not isinstance(current_app.session_interface, ServerSessionInterface):
+        raise click.ClickException("SESSION_BACKEND is 'cookie', there are no sessions on the server")
+    click.echo(f"Deleted {current_app.session_interface.store.delete_expired(datetime.now())} expired session(s)")
+
+
+COMMANDS = (gc_images, scrub_images, backfill_content, reconcile_counters_command, export_data, import_data,
+            build_static, purge_sessions)
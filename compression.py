@@ -0,0 +1,129 @@
+import re
+import zlib
+
+from jinja2.ext import Extension
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+from werkzeug.wsgi import ClosingIterator
+
+import brotli
+
+
+""" RESPONSE COMPRESSION """
+# WSGI middleware compressing dynamic responses with brotli or gzip (set up by create_app)
+    # Only allowed content types of at least min_size bytes, and never twice (the built static files
+    # already carry a Content-Encoding, see static_assets.py)
+    # Compressed responses get a weak ETag, the bytes differ per encoding but the 304s keep working
+    # (werkzeug compares If-None-Match weakly)
+
+ENCODINGS = ("br", "gzip")  # Preferred first
+STREAM_FLUSH_BYTES = 8 * 1024   # Streamed input compressed between two flushes to the client
+
+
+class Compressor:
+    def __init__(self, app, min_size, mimetypes, gzip_level, brotli_quality):
+        self.app = app
+        self.min_size = min_size
+        self.mimetypes = set(mimetypes)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    # Picks the encoding for a response and rewrites its headers (werkzeug Headers) to match, None to send as is
+    def negotiate(self, accept_encoding, status, headers):
+        if (status < 200 or status in (204, 206, 304) or "Content-Encoding" in headers
+                or headers.get("Content-Type", "").split(";")[0].strip() not in self.mimetypes
+                or "no-transform" in parse_cache_control_header(headers.get("Cache-Control"))):
+            return None
+        length = headers.get("Content-Length", type=int)
+        if length is not None and length < self.min_size:
+            return None
+
+        # Compressible, so caches must keep a copy per Accept-Encoding even when this client gets it plain
+        vary = headers.get("Vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower() and vary != "*":
+            headers["Vary"] = vary + ", Accept-Encoding"
+        accepted = parse_accept_header(accept_encoding)
+        encoding = next((encoding for encoding in ENCODINGS if accepted[encoding]), None)
+        if encoding is None:
+            return None
+
+        headers["Content-Encoding"] = encoding
+        headers.remove("Content-Length")
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        return encoding
+
+    # (compress, flush, finish) for one response body
+    def compressor(self, encoding):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.flush, compressor.finish
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)   # wbits 31: gzip header & trailer
+        return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    def compress(self, encoding, body):
+        compress, _, finish = self.compressor(encoding)
+        return compress(body) + finish()
+
+    # Streamed responses leave in pieces as before, flushed every STREAM_FLUSH_BYTES
+        # (flushing each small template chunk would cost most of the compression)
+    def compress_stream(self, encoding, chunks):
+        compress, flush, finish = self.compressor(encoding)
+        pending = 0
+        for chunk in chunks:
+            data = compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                data += flush()
+                pending = 0
+            if data:
+                yield data
+        yield finish()
+
+    def __call__(self, environ, start_response):
+        response = []
+
+        # Flask calls start_response before handing back the body
+        def capture(status, headers, exc_info=None):
+            response[:] = [status, Headers(headers), exc_info]
+
+        chunks = self.app(environ, capture)
+        status, headers, exc_info = response
+        length = headers.get("Content-Length", type=int)
+        encoding = None
+        if environ["REQUEST_METHOD"] != "HEAD":
+            encoding = self.negotiate(environ.get("HTTP_ACCEPT_ENCODING", ""), int(status.split(" ", 1)[0]), headers)
+        if encoding is None:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return chunks
+
+        if length is not None:
+            # Whole body at hand, compressed in one go with its new length
+            try:
+                body = self.compress(encoding, b"".join(chunks))
+            finally:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+            headers["Content-Length"] = str(len(body))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [body]
+
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        # Keeping the body's close(), Flask tears down stream_with_context requests there
+        return ClosingIterator(self.compress_stream(encoding, chunks), getattr(chunks, "close", None))
+
+
+""" HTML MINIFICATION """
+# Jinja extension dropping indentation, trailing spaces & blank lines from the .html templates when they compile
+    # Rendering costs nothing more and user content (post bodies) is never touched
+    # Newlines stay, so inline scripts keep working, whitespace that matters (<pre>, <textarea>) must be on one line
+class CollapseWhitespace(Extension):
+    LINE_BREAK_RE = re.compile(r"[ \t]*\n\s*")
+
+    def preprocess(self, source, name, filename=None):
+        if name and name.endswith(".html"):
+            return self.LINE_BREAK_RE.sub("\n", source)
+        return source
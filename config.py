@@ -0,0 +1,69 @@
+import os
+
+from db_config import database_uri
+
+
+""" CONFIG """
+# Defaults for create_app (app.py), anything passed to create_app(config) overrides them
+class Config:
+    SECRET_KEY = 'pass'     # Secret Key
+    SQLALCHEMY_DATABASE_URI = database_uri()    # Database (DATABASE_URL, see db_config.py)
+    SQLALCHEMY_ENGINE_OPTIONS = None    # Default tuned for the database above (engine_options in db_config.py)
+    POSTS_PER_PAGE = 10     # Posts shown per page on the blog feed
+    ADMIN_PER_PAGE = 25     # Rows per page in each admin table
+    # Search engine: "database" (FTS5/tsvector) or "memory" (search_index.py, no DB support needed)
+    SEARCH_BACKEND = 'database'
+    SEARCH_RESULTS = 50     # Best matches shown per search (not paginated), the page says when there were more
+    SEARCH_INDEX_PATH = None    # Default <instance folder>/search_index.pkl.gz
+    SEARCH_INDEX_COMPACT_BYTES = 4 * 1024 * 1024    # Delta log size folded into a new snapshot (in the background)
+    # Rendered post fragments: "memory" (per worker LRU) or "redis" (shared, needs the redis package)
+    CACHE_BACKEND = 'memory'
+    CACHE_MAX_BYTES = 32 * 1024 * 1024
+    CACHE_REDIS_URL = 'redis://localhost:6379/0'
+    CACHE_TIMEOUT = 24 * 60 * 60    # Seconds, redis only
+    # Slim logged in user records kept by each worker
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 30     # Seconds
+    # Password hashing: werkzeug method with its cost, older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = 2       # Processes per app worker, 0 hashes in the request thread
+    PASSWORD_HASH_MAX_PENDING = 8   # Hashes waiting per app worker before answering 503
+    # Sessions: "database" (sessions table), "memory" (per worker, one process only) or "cookie" (Flask's signed cookie)
+        # The first two keep only an id in the cookie (see session_store.py)
+    SESSION_BACKEND = 'database'
+    SESSION_PURGE_INTERVAL = 10 * 60    # Seconds between deletes of expired sessions per worker, 0 for cron only
+    # Rate limits (see rate_limit.py): "sqlite" (a file shared by the workers of this host), "memory" (per worker) or "off"
+    RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "sqlite")
+    RATE_LIMIT_PATH = None      # Default <instance folder>/rate_limits.db, best on a local disk (or /dev/shm)
+    # Proxies in front adding X-Forwarded-For, the client IP is read past them
+        # Set RATE_LIMIT_PROXIES=1 on Heroku ("heroku config:set RATE_LIMIT_PROXIES=1"), with 0 every client
+        # shares the router's IP and so one bucket
+    RATE_LIMIT_PROXIES = int(os.environ.get("RATE_LIMIT_PROXIES", 0))
+    # (requests, seconds) per client IP, per account tried (failed attempts) and per logged in user, by the name given to @rate_limit
+    RATE_LIMITS = {'login': (10, 60),               # Password check
+                   'test_pw': (10, 60),             # Password check
+                   'add_user': (20, 60 * 60),       # Password hash
+                   'search': (30, 60)}              # Full-text search
+    # Request profiler (see profiler.py)
+    QUERY_BUDGET = 10           # SQL statements per request before warning
+    QUERY_BUDGETS = {}          # Per endpoint overrides, e.g. {'users.admin': 20}
+    QUERY_BUDGET_MODE = 'warn'  # "raise" makes over budget requests fail (for tests)
+    PROFILER_HEADERS = True     # Server-Timing header with db/render/total time
+    # Response compression (see compression.py)
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 500     # Bytes, smaller bodies are sent as is
+    COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+                          'application/json', 'application/xml', 'image/svg+xml')
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4     # Per request, the static build uses the slow maximum (11)
+    MINIFY_HTML = True      # Templates without indentation & blank lines
+
+    # Image upload folder
+    UPLOAD_FOLDER = 'static/images/'
+    THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER, 'thumbs/')   # Resized profile pics
+    MAX_UPLOAD_BYTES = 5 * 1024 * 1024      # Profile pic size cap
+    MAX_CONTENT_LENGTH = 8 * 1024 * 1024    # Whole request cap, werkzeug answers 413 above it
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 60 * 60    # Seconds, resized pics never change under their URL
+    # Static files (see static_assets.py), built by "flask build-static"
+    STATIC_BUILD_FOLDER = None  # Default <static folder>/build
+    STATIC_CACHE_MAX_AGE = 365 * 24 * 60 * 60   # Seconds, built files are named after their content
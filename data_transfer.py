@@ -0,0 +1,132 @@
+import csv
+import itertools
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, insert, select, text
+from werkzeug.security import generate_password_hash
+
+
+""" BULK EXPORT / IMPORT """
+# Whole tables to and from JSONL or CSV, used by the "flask export" & "flask import" commands
+    # Export streams the rows (server-side cursor on Postgres), memory stays flat at any table size
+    # Import inserts batch_size rows per executemany, each batch in its own transaction
+    # A failing batch is rolled back and stops the import, the batches before it stay committed
+    # Every record of a file should have the same fields (CSV always does)
+
+FORMATS = ("jsonl", "csv")
+
+
+# --format wins, else from the extension, stdin/stdout default to JSONL
+def guess_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def to_text(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# Returns the number of rows written
+def export_table(session, table, out, fmt, batch_size=1000):
+    columns = [column.name for column in table.columns]
+    query = select(table).order_by(*table.primary_key.columns)
+    rows = session.execute(query, execution_options={"yield_per": batch_size})
+    count = 0
+
+    if fmt == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(columns)
+        for batch in rows.partitions():
+            writer.writerows(["" if value is None else to_text(value) for value in row] for row in batch)
+            count += len(batch)
+    else:
+        for batch in rows.partitions():
+            out.writelines(json.dumps(dict(zip(columns, row)), default=to_text) + "\n" for row in batch)
+            count += len(batch)
+    return count
+
+
+# Records as dicts, still text (CSV) or JSON values
+def read_records(file, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+# Text -> Python value per column, "" and null are None
+    # Text columns keep "", except nullable ones read from CSV: export writes NULL as "" there
+    # (a NULL content_html/excerpt must stay NULL for backfill-content to find it)
+def column_parser(column, fmt="jsonl"):
+    if isinstance(column.type, DateTime):
+        parse = datetime.fromisoformat
+    elif isinstance(column.type, Integer):
+        parse = int
+    elif fmt == "csv" and column.nullable:
+        parse = str
+    else:
+        return lambda value: value
+    return lambda value: None if value is None or value == "" else parse(value)
+
+
+# Yields the running row count after each committed batch
+    # prepare(batch) can rework the raw records first (e.g. hashing passwords)
+    # Fields that aren't columns of the table are dropped
+def import_table(session, table, records, batch_size=10000, prepare=None, fmt="jsonl"):
+    parsers = {column.name: column_parser(column, fmt) for column in table.columns}
+    statement = insert(table)
+    count = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return
+        if prepare:
+            batch = prepare(batch)
+        # executemany needs the same keys on every row, the first record decides them
+        names = [name for name in batch[0] if name in parsers]
+        rows = [{name: parsers[name](record.get(name)) for name in names} for record in batch]
+        try:
+            session.execute(statement, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        count += len(rows)
+        yield count
+
+
+# prepare() for users: plain "password" fields become password_hash
+    # map_function spreads the hashing, e.g. a ProcessPoolExecutor's map (builtin map hashes inline)
+def password_hashing(method, map_function=map):
+    def prepare(batch):
+        todo = [record for record in batch if record.get("password") and not record.get("password_hash")]
+        passwords = [record.pop("password") for record in todo]
+        hashes = map_function(generate_password_hash, passwords, itertools.repeat(method, len(passwords)))
+        for record, password_hash in zip(todo, hashes):
+            record["password_hash"] = password_hash
+        return batch
+    return prepare
+
+
+# prepare() for posts: rows without a date_posted (NULL in older exports) take their last edit time or now
+    # The column is NOT NULL, the feed's cursors are built from it
+def post_dating(now):
+    def prepare(batch):
+        for record in batch:
+            if not record.get("date_posted"):
+                record["date_posted"] = record.get("date_updated") or now.isoformat()
+        return batch
+    return prepare
+
+
+# Imported rows keep their ids, Postgres' id sequence has to be moved past them
+def reset_id_sequence(session, table):
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                             f"coalesce(max(id), 1)) FROM {table.name}"))
+        session.commit()
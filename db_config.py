@@ -0,0 +1,54 @@
+import os
+
+from sqlalchemy import event
+
+
+""" DATABASE CONFIG """
+# Database picked from the environment, engine settings tuned per backend
+    # DATABASE_URL           default sqlite:///users.db (instance folder)
+    # SQLite:   SQLITE_BUSY_TIMEOUT (s), SQLITE_MMAP_SIZE (bytes)
+    # Postgres: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (s), DB_POOL_RECYCLE (s)
+
+
+def database_uri():
+    uri = os.environ.get("DATABASE_URL", "sqlite:///users.db")
+    # Heroku style URLs, SQLAlchemy only accepts postgresql://
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+# Same database through an asyncio driver, for the async serving mode (see asgi.py)
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url):
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+# Goes into SQLALCHEMY_ENGINE_OPTIONS
+def engine_options(uri):
+    if uri.startswith("sqlite"):
+        # Seconds to wait on a locked database before raising "database is locked"
+        return {"connect_args": {"timeout": float(os.environ.get("SQLITE_BUSY_TIMEOUT", 15))}}
+
+    # Per app worker, so the server sees up to workers * (size + overflow) connections
+    return {"pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+            "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+            "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),   # Before server/proxy idle cutoffs
+            "pool_pre_ping": True}  # Drops connections the server closed instead of failing the request
+
+
+# Per connection SQLite settings, run on every new connection in the pool
+def tune_sqlite(engine):
+    if engine.dialect.name != "sqlite":
+        return
+    mmap_size = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")       # Readers no longer block the writer (and vice versa)
+        cursor.execute("PRAGMA synchronous=NORMAL")     # Safe with WAL, fsync only at checkpoints
+        cursor.execute(f"PRAGMA mmap_size={mmap_size}") # Reads straight from the page cache
+        cursor.close()
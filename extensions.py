@@ -0,0 +1,36 @@
+from flask import current_app, session
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+
+""" EXTENSIONS """
+# Created unbound so every module can import them, create_app (app.py) sets them up for its app
+db = SQLAlchemy()
+
+# Flask-Login checks for a pending remember cookie after every request, which reads the session
+    # The flag never outlives the request that sets it (login_user/logout_user, so the session was used),
+    # a request that never touched its session (static files, /metrics) skips the check and loads nothing
+    # Unless the cookie is refreshed on every request (REMEMBER_COOKIE_REFRESH_EACH_REQUEST)
+class LazyLoginManager(LoginManager):
+    def _update_remember_cookie(self, response):
+        if session.accessed or current_app.config.get("REMEMBER_COOKIE_REFRESH_EACH_REQUEST"):
+            return super()._update_remember_cookie(response)
+        return response
+
+# Flask Logic Configuration
+login_manager = LazyLoginManager()
+login_manager.login_view = "auth.login"
+
+
+# Per app services, built by create_app from its config and kept in app.extensions
+    # Usable wherever there is an app context (requests, CLI commands, "with app.app_context()")
+def service(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+password_hasher = service("password_hasher")    # Hashing off the request process (see password_hasher.py)
+user_cache = service("user_cache")              # Logged in users (see user_cache.py)
+fragment_cache = service("fragment_cache")      # Rendered post fragments (see fragment_cache.py)
+thumbnailer = service("thumbnailer")            # Resized profile pics (see image_pipeline.py)
+profiler = service("profiler")                  # Query counts & timings per request (see profiler.py)
+metrics = service("metrics")                    # Prometheus metrics (see metrics.py)
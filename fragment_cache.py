@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+
+
+""" FRAGMENT CACHE """
+# Caches rendered template fragments that don't depend on who is viewing them
+    # Entries are stored as "<version>\n<html>" and a version mismatch counts as a miss,
+    # so a worker never serves a fragment older than the row it was rendered from
+
+
+""" BACKENDS """
+# In-process LRU bounded by the total size of cached values
+class MemoryCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)   # Most recently used
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = value
+            self.size += len(value)
+            # Evicting least recently used until back under the cap
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                old = self.entries.pop(key, None)
+                if old is not None:
+                    self.size -= len(old)
+
+
+# Any server speaking the Redis protocol, shared by all workers
+    # Memory cap and eviction come from the server (maxmemory + allkeys-lru)
+class RedisCache:
+    def __init__(self, url, timeout):
+        import redis    # Optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value):
+        self.client.set(key, value, ex=self.timeout)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+
+""" FRAGMENTS """
+class FragmentCache:
+    def __init__(self, backend, names):
+        self.backend = backend
+        self.names = names  # Every fragment template, needed to invalidate all of a post's entries
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached html for (name, post id) if it is still at version, else renders it
+    def render(self, name, post_id, version, render):
+        key = f"fragment:{name}:{post_id}"
+        cached = self.backend.get(key)
+        if cached is not None:
+            cached_version, _, html = cached.partition("\n")
+            if cached_version == version:
+                self.hits += 1
+                return html
+
+        self.misses += 1
+        html = render()
+        self.backend.set(key, version + "\n" + html)
+        return html
+
+    def invalidate(self, *post_ids):
+        self.backend.delete(*[f"fragment:{name}:{post_id}" for post_id in post_ids for name in self.names])
+
+
+# Picks the backend from app config
+def make_cache(config, names):
+    if config['CACHE_BACKEND'] == "redis":
+        backend = RedisCache(config['CACHE_REDIS_URL'], config['CACHE_TIMEOUT'])
+    else:
+        backend = MemoryCache(config['CACHE_MAX_BYTES'])
+    return FragmentCache(backend, names)
@@ -0,0 +1,32 @@
+import os
+import shutil
+
+
+""" GUNICORN CONFIG """
+# Picked up automatically by "gunicorn" (see Procfile)
+
+# SERVER_MODE=sync (default): the Flask app on sync workers
+# SERVER_MODE=async: asgi.py on uvicorn workers, the read routes run on the async engine (see asgi.py)
+server_mode = os.environ.get("SERVER_MODE", "sync")
+if server_mode == "async":
+    wsgi_app = "asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "app:create_app()"
+
+# The app is built once in the master, workers are forked with it already loaded
+    # Cuts worker start up and their memory is shared copy-on-write until written to
+    # create_app opens no DB connection, thread or process pool (all made on first use in the worker)
+preload_app = True
+
+# Shared folder for the per worker metric files (see metrics.py)
+    # Must be set before prometheus_client is first imported, emptied on each start
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/flasker-metrics")
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir)
+
+
+# Dropping the live gauges of workers that exited
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,362 @@
+from datetime import datetime
+from flask import current_app, g, make_response, render_template, request, session, url_for
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf, validate_csrf
+from markupsafe import Markup, escape
+from sqlalchemy import or_, text, tuple_
+from sqlalchemy.orm import defer, selectinload
+
+from extensions import db, fragment_cache
+from image_pipeline import pick_size
+from models import Posts, Users
+from search_index import SharedSearchIndex
+from wtforms import ValidationError
+
+import hashlib
+import time
+
+
+""" HELPERS """
+# Feed cursor -> "<date_posted iso>_<id>" of a post
+def encode_cursor(post):
+    return f"{post.date_posted.isoformat()}_{post.id}"
+
+# Returns (date_posted, id) or None if missing/tampered
+    # Ids past a 64-bit integer can't even be bound as parameters, no post has them
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        date_posted, post_id = cursor.rsplit("_", 1)
+        date_posted, post_id = datetime.fromisoformat(date_posted), int(post_id)
+    except ValueError:
+        return None
+    if not 1 <= post_id < 2 ** 63:
+        return None
+    return date_posted, post_id
+
+# Keyset seek for the posts feed, newest first
+def seek_feed(query, before=None, after=None):
+    if after:
+        query = query.filter(tuple_(Posts.date_posted, Posts.id) > after)
+        return query.order_by(Posts.date_posted.asc(), Posts.id.asc())
+    if before:
+        query = query.filter(tuple_(Posts.date_posted, Posts.id) < before)
+    return query.order_by(Posts.date_posted.desc(), Posts.id.desc())
+
+# Read routes in steps: statements, validators, rendering
+    # The sync routes and the async ones (asgi.py) run the same statements through their own session
+
+# Cursors point at the (date_posted, id) of the last post seen
+    # Seeking past it uses the sort order directly instead of OFFSET, so deep pages stay fast
+def feed_cursors():
+    before = decode_cursor(request.args.get("before"))  # Older posts (next page)
+    after = decode_cursor(request.args.get("after"))    # Newer posts (previous page)
+    return before, after
+
+# Conditional GET: only the page's ids & edit times are read before deciding to render
+    # Author renames rewrite posts.author_name (and so date_updated), no join with users needed
+def feed_versions_statement(before, after):
+    statement = seek_feed(db.select(Posts.id, Posts.date_updated), before, after)
+    return statement.limit(current_app.config['POSTS_PER_PAGE'] + 1)
+
+def feed_validators(versions):
+    return make_etag("posts", versions)
+
+# Authors aren't loaded, the feed shows posts.author_name
+    # The feed shows excerpts, the full content columns are left in the DB
+    # Fetching one extra row to know if there is another page
+def feed_statement(before, after):
+    statement = db.select(Posts).options(defer(Posts.content), defer(Posts.content_html))
+    return seek_feed(statement, before, after).limit(current_app.config['POSTS_PER_PAGE'] + 1)
+
+def render_feed(posts, before, after, etag):
+    per_page = current_app.config['POSTS_PER_PAGE']
+    has_more = len(posts) > per_page
+    posts = posts[:per_page]
+    if after:
+        posts.reverse()     # Walked backwards, flip to newest first
+
+    # Older posts exist if we came back from them or found an extra row
+    next_cursor = None
+    prev_cursor = None
+    if posts:
+        if after or has_more:
+            next_cursor = encode_cursor(posts[-1])
+        if before or (after and has_more):
+            prev_cursor = encode_cursor(posts[0])
+
+    response = make_response(render_template("posts.html", 
+                                             posts=posts, 
+                                             next_cursor=next_cursor, 
+                                             prev_cursor=prev_cursor))
+    set_validators(response, etag)
+    return response
+
+# Conditional GET: checking the post & author edit times before loading the post
+def post_versions_statement(id):
+    statement = db.select(Posts.date_updated, Users.date_updated).select_from(Posts).outerjoin(Posts.poster)
+    return statement.where(Posts.id == id)
+
+def post_validators(id, versions):
+    return make_etag("post", id, tuple(versions))
+
+# The page shows the author's pic & about, loaded along with the post
+def post_statement(id):
+    return db.select(Posts).options(selectinload(Posts.poster)).where(Posts.id == id)
+
+def render_post(post, etag):
+    response = make_response(render_template("post.html", post=post))
+    set_validators(response, etag)
+    return response
+
+# Conditional GET (ETag only) for the read routes
+    # Pages embed the viewer's nav and CSRF tokens, so the ETag also covers who is asking
+    # No Last-Modified: the newest edit time of a page doesn't change when a post on it is deleted,
+    # nor when the viewer logs in or out, so If-Modified-Since alone would answer a stale 304
+    # and rolls over at half the CSRF token lifetime so a cached page never holds a dead token
+def make_etag(*parts):
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    window = int(time.time() // (time_limit / 2)) if time_limit else 0
+    return hashlib.sha1(repr((parts, current_user.get_id(), window)).encode()).hexdigest()
+
+def set_validators(response, etag):
+    response.set_etag(etag)
+    # Per user, and browsers must check back each time (answered by a cheap 304)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+# Returns a 304 response if the client's copy is still current, else None
+def conditional_response(etag):
+    # Pending flash messages have to be rendered (and consumed)
+    if session.get("_flashes"):
+        return None
+    response = make_response("")
+    set_validators(response, etag)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    return None
+
+# Full-text search over title, slug & content ranked by relevance
+    # Indexes are created by the "posts full text search" migration
+    # Returns (select, ranked ids), the ids are only set when the memory index did the ranking
+    # and select is None when there is nothing to search for
+    # Only the best SEARCH_RESULTS are shown (no pages), one more is fetched to tell the page there were others
+def search_statement(searched):
+    statement = db.select(Posts)    # Results show posts.author_name, the authors aren't loaded
+    limit = current_app.config['SEARCH_RESULTS'] + 1
+    dialect = db.engine.dialect.name
+
+    if current_app.config['SEARCH_BACKEND'] == "memory":
+        # Ranked ids from the in-process index, then loading them (put back in order by rank_results)
+        post_ids = get_search_index().search(searched, limit)
+        return statement.where(Posts.id.in_(post_ids)), post_ids
+
+    if dialect == "sqlite":
+        # Quoting every word so user input can't break FTS5 query syntax
+        terms = " ".join('"' + word.replace('"', '""') + '"' for word in searched.split())
+        if not terms:
+            return None, None
+        posts_fts = db.table("posts_fts", db.column("rowid"))
+        statement = statement.join(posts_fts, posts_fts.c.rowid == Posts.id)
+        statement = statement.where(text("posts_fts MATCH :terms").bindparams(terms=terms))
+        statement = statement.order_by(text("bm25(posts_fts)"))   # Lower is better
+
+    elif dialect == "postgresql":
+        # Same expression as the GIN index so Postgres can use it
+        document = text("to_tsvector('english', posts.title || ' ' || posts.slug || ' ' || posts.content)")
+        terms = db.func.plainto_tsquery("english", searched)
+        statement = statement.where(document.op("@@")(terms))
+        statement = statement.order_by(db.func.ts_rank(document, terms).desc())
+
+    else:
+        # No full-text engine, falling back to a LIKE scan
+        pattern = '%' + searched + '%'
+        statement = statement.where(or_(Posts.title.like(pattern), 
+                                        Posts.slug.like(pattern), 
+                                        Posts.content.like(pattern)))
+        statement = statement.order_by(Posts.title)
+
+    return statement.limit(limit), None
+
+def rank_results(posts, ranked):
+    if ranked is None:  # Already in order from the DB
+        return posts
+    posts = {post.id: post for post in posts}
+    return [posts[post_id] for post_id in ranked if post_id in posts]
+
+def fulltext_search(searched):
+    statement, ranked = search_statement(searched)
+    if statement is None:
+        return []
+    return rank_results(db.session.scalars(statement).all(), ranked)
+
+def render_search(form, searched, posts):
+    shown = current_app.config['SEARCH_RESULTS']
+    return render_template("search.html", form=form, searched=searched, posts=posts[:shown], more=len(posts) > shown)
+
+# In-process search index (SEARCH_BACKEND = "memory")
+    # Every worker keeps its own copy, kept in step with the others through a shared delta log (see search_index.py)
+search_index = None
+
+def shared_search_index():
+    global search_index
+    path = current_app.config['SEARCH_INDEX_PATH']
+    if search_index is None or search_index.path != path:
+        search_index = SharedSearchIndex(path, current_app.config['SEARCH_INDEX_COMPACT_BYTES'], current_app.logger)
+    return search_index
+
+def get_search_index():
+    index = shared_search_index()
+    if not index.refresh():
+        # No usable snapshot, building from the DB once (the first worker to get here does it for all)
+        index.build(lambda: db.session.query(Posts.id, Posts.title, Posts.slug, Posts.content).yield_per(1000))
+    return index
+
+# Dropped so the next search rebuilds it from the DB (after bulk imports)
+def reset_search_index():
+    shared_search_index().reset()
+
+# Cache of the viewer independent parts of post pages (made by create_app)
+    # Fragment templates rendered through post_fragment(), all of them must be listed here
+FRAGMENTS = ("post_summary.html", "post_body.html")
+
+# Fragments showing more of the author than posts.author_name (pic, about), their version includes the author's
+AUTHOR_FRAGMENTS = {"post_body.html"}
+
+# Changes whenever the post (or its author, with_author) is edited
+    # Renaming an author rewrites author_name, so date_updated of their posts changes too
+def post_version(post, with_author=True):
+    version = str(post.date_updated.timestamp() if post.date_updated else post.date_posted.timestamp())
+    if with_author and post.poster and post.poster.date_updated:
+        version += "-" + str(post.poster.date_updated.timestamp())
+    return version
+
+# Used in templates: {{ post_fragment("post_summary.html", post) }}
+def post_fragment(name, post):
+    # Rendering without the request context processors, fragments can't depend on the viewer
+    html = fragment_cache.render(name, post.id, post_version(post, with_author=name in AUTHOR_FRAGMENTS), 
+                                 lambda: current_app.jinja_env.get_template(name).render(post=post))
+    return Markup(html)
+
+# Used in templates: {{ avatar_url(user.profile_pic, 150, "webp") }}
+    # Smallest resized copy covering width, the default pic for users without one
+def avatar_url(profile_pic, width, fmt="jpg"):
+    if not profile_pic:
+        return url_for('static', filename='images/default_pic.png')
+    return url_for('users.avatar', size=pick_size(width), fmt=fmt, filename=profile_pic)
+
+# Used in templates: {{ url_with_args(users_page=2) }}
+    # Current page's URL with some query args replaced, for pagers & sort links
+def url_with_args(**changes):
+    args = request.args.to_dict()
+    args.update(changes)
+    return url_for(request.endpoint, **request.view_args, **args)
+
+# Used in templates: {{ csrf_input() }}
+    # CSRF field for the forms that are only a button or a box (search, delete) without building a FlaskForm,
+    # generate_csrf() signs one token per request and every form on the page shares it
+def csrf_input():
+    if "csrf_input" not in g:
+        g.csrf_input = Markup(f'<input name="csrf_token" type="hidden" value="{escape(generate_csrf())}">')
+    return g.csrf_input
+
+# Checks the token sent by those forms (FlaskForm.validate_on_submit does it for the others)
+def csrf_valid():
+    if not current_app.config.get('WTF_CSRF_ENABLED', True):     # Flask-WTF's default
+        return True
+    try:
+        validate_csrf(request.form.get("csrf_token"))
+        return True
+    except ValidationError:
+        return False
+
+# Admin tables: sortable columns, the first one is the default order
+ADMIN_USER_SORTS = {"date_added": Users.date_added, "username": Users.username, "name": Users.name, "id": Users.id, 
+                    "post_count": Users.post_count}
+ADMIN_POST_SORTS = {"date_posted": Posts.date_posted, "title": Posts.title, "id": Posts.id}
+
+# One page of an admin table from the "<prefix>_sort/_dir/_page" query args
+    # The COUNT runs with only the filters (no ORDER BY/joins) so it can be answered from an index
+    # OFFSET paging since any column can be sorted on, pages are small and admin only
+def admin_table(prefix, model, sorts, filters=(), options=()):
+    args = request.args
+    sort = args.get(f"{prefix}_sort")
+    if sort not in sorts:
+        sort = next(iter(sorts))
+    descending = args.get(f"{prefix}_dir") == "desc"
+    per_page = current_app.config['ADMIN_PER_PAGE']
+
+    total = db.session.scalar(db.select(db.func.count()).select_from(model).where(*filters))
+    pages = max(1, -(-total // per_page))
+    page = min(max(args.get(f"{prefix}_page", 1, type=int), 1), pages)
+
+    order = sorts[sort].desc() if descending else sorts[sort].asc()
+    query = db.select(model).options(*options).where(*filters)
+    query = query.order_by(order, model.id.desc() if descending else model.id.asc())
+    rows = db.session.scalars(query.limit(per_page).offset((page - 1) * per_page)).all()
+    return {"rows": rows, "total": total, "page": page, "pages": pages, "sort": sort, "descending": descending}
+
+# Dropping cached fragments for every post of an author (profile changes)
+def invalidate_author(user_id):
+    post_ids = db.session.scalars(db.select(Posts.id).filter_by(poster_id=user_id)).all()
+    fragment_cache.invalidate(*post_ids)
+
+# Users.post_count/last_posted_at & Posts.author_name, changed in the same transaction as the post/user
+    # Atomic UPDATEs (post_count + 1) so concurrent requests can't lose a count
+    # The author's date_updated is kept, counters moving isn't a profile edit (it versions their fragments)
+def count_post(user_id, date_posted):
+    statement = db.update(Users).where(Users.id == user_id).returning(Users.name)
+    statement = statement.values(post_count=Users.post_count + 1, 
+                                 last_posted_at=date_posted, 
+                                 date_updated=Users.date_updated)
+    return db.session.execute(statement).scalar_one()    # Author name for the new post
+
+# After the post's DELETE has been flushed
+def uncount_post(user_id):
+    latest = db.select(db.func.max(Posts.date_posted)).where(Posts.poster_id == user_id).scalar_subquery()
+    db.session.execute(db.update(Users).where(Users.id == user_id).values(post_count=Users.post_count - 1, 
+                                                                          last_posted_at=latest, 
+                                                                          date_updated=Users.date_updated))
+
+# Copying a (possibly) new name onto the user's posts, only rows that differ are written
+def sync_author_name(user_id, name):
+    db.session.execute(db.update(Posts).where(Posts.poster_id == user_id, Posts.author_name.is_distinct_from(name))
+                                       .values(author_name=name), 
+                       execution_options={"synchronize_session": False})
+
+# Repairs the copies above from the source rows, returns how many (users, posts) had drifted
+def reconcile_counters(dry_run=False):
+    # Correlated per user, both answered from ix_posts_poster_id_date_posted
+    post_count = db.select(db.func.count()).where(Posts.poster_id == Users.id).scalar_subquery()
+    latest = db.select(db.func.max(Posts.date_posted)).where(Posts.poster_id == Users.id).scalar_subquery()
+    author_name = db.select(Users.name).where(Users.id == Posts.poster_id).scalar_subquery()
+    users_drift = or_(Users.post_count != post_count, Users.last_posted_at.is_distinct_from(latest))
+    posts_drift = Posts.author_name.is_distinct_from(author_name)
+
+    if dry_run:
+        users = db.session.scalar(db.select(db.func.count()).select_from(Users).where(users_drift))
+        posts = db.session.scalar(db.select(db.func.count()).select_from(Posts).where(posts_drift))
+        return users, posts
+
+    options = {"synchronize_session": False}
+    users = db.session.execute(db.update(Users).where(users_drift).values(post_count=post_count, 
+                                                                       last_posted_at=latest, 
+                                                                       date_updated=Users.date_updated), 
+                               execution_options=options).rowcount
+    # Changing author_name moves the posts' date_updated, their cached fragments roll over
+    posts = db.session.execute(db.update(Posts).where(posts_drift).values(author_name=author_name), 
+                               execution_options=options).rowcount
+    db.session.commit()
+    return users, posts
+
+# Keeping the index in sync from the blog CRUD routes
+    # One appended log record each, the snapshot is rewritten in the background (see search_index.py)
+def index_post(post):
+    if current_app.config['SEARCH_BACKEND'] == "memory":
+        get_search_index().add(post.id, post.title, post.slug, post.content)
+
+def unindex_post(post_id):
+    if current_app.config['SEARCH_BACKEND'] == "memory":
+        get_search_index().remove(post_id)
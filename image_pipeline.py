@@ -0,0 +1,197 @@
+import hashlib
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+
+""" PROFILE IMAGE PIPELINE """
+# Uploads are streamed to disk by the request, resizing happens in a background thread
+    # Every picture gets a WebP and a JPEG at each of AVATAR_SIZES (px, longest side)
+    # Until they exist the avatar route serves the original
+    # Originals are public (static folder), so they are stored re-encoded: pixels only, no EXIF (GPS position,
+    # camera), ICC profile or comments
+    # Originals are content addressed: "<2 hex>/<sha256>.<ext>" under the upload folder,
+    # identical uploads share one file and unreferenced ones are removed by collect_garbage()
+
+AVATAR_SIZES = (80, 160, 240)
+AVATAR_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+# Originals keep their format if browsers show it, anything else Pillow reads is stored as PNG
+ORIGINAL_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+CHUNK_SIZE = 64 * 1024
+BLOB_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{64}\.\w+$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class NotAnImage(Exception):
+    pass
+
+
+# Copies the upload to disk in chunks (capped), then stores its re-encoded copy under the copy's hash
+    # Returns (key, created), created is False when the same picture was already stored
+def store_upload(file, folder, max_bytes):
+    written = 0
+    descriptor, upload_path = tempfile.mkstemp(dir=folder, suffix=".part")
+    clean_path = upload_path + ".clean"
+    try:
+        with os.fdopen(descriptor, "wb") as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Profile pic is larger than {max_bytes // (1024 * 1024)} MB")
+                out.write(chunk)
+        try:
+            extension = strip_metadata(upload_path, clean_path)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+            raise NotAnImage("Profile pic is not a readable image")
+
+        digest = hashlib.sha256()
+        with open(clean_path, "rb") as clean:
+            for chunk in iter(lambda: clean.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        key = f"{digest.hexdigest()[:2]}/{digest.hexdigest()}{extension}"
+        path = os.path.join(folder, key)
+        if os.path.exists(path):
+            os.utime(path)  # Fresh mtime keeps it out of collect_garbage()'s grace period
+            return key, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(clean_path, path)
+        return key, True
+    finally:
+        for temp_path in (upload_path, clean_path):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+# Writes the picture at source to path with its pixels only, returns the extension of the format written
+    # Camera rotation lives in the EXIF, it is applied to the pixels first
+def strip_metadata(source, path):
+    with Image.open(source) as image:
+        fmt = image.format if image.format in ORIGINAL_EXTENSIONS else "PNG"
+        image = ImageOps.exif_transpose(image)
+        # save() carries some of info over by itself (e.g. JPEG comments), only transparency is pixel data
+        image.info = {key: value for key, value in image.info.items() if key == "transparency"}
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(path, fmt, **({"quality": 90} if fmt in ("JPEG", "WEBP") else {}))
+    return ORIGINAL_EXTENSIONS[fmt]
+
+
+# Deletes stored originals (and their thumbnails) whose key is not in referenced
+    # Files younger than grace_seconds are kept, an upload may not be committed yet
+def collect_garbage(folder, thumbs_folder, referenced, grace_seconds, dry_run=False):
+    removed = []
+    now = time.time()
+    for shard in sorted(os.listdir(folder)):
+        shard_path = os.path.join(folder, shard)
+        if len(shard) != 2 or not os.path.isdir(shard_path):
+            continue
+        for name in sorted(os.listdir(shard_path)):
+            key = f"{shard}/{name}"
+            path = os.path.join(shard_path, name)
+            if not BLOB_RE.match(key) or key in referenced or now - os.path.getmtime(path) < grace_seconds:
+                continue
+            removed.append(key)
+            if dry_run:
+                continue
+            os.remove(path)
+            for size in AVATAR_SIZES:
+                for fmt in AVATAR_FORMATS:
+                    thumbnail = os.path.join(thumbs_folder, thumbnail_name(key, size, fmt))
+                    if os.path.exists(thumbnail):
+                        os.remove(thumbnail)
+    return removed
+
+
+# Re-encodes the stored originals in place (uploads from before store_upload stripped metadata), thumbnails too
+    # Keys stay as they are, users keep pointing at them; returns (scrubbed, unreadable) keys
+def scrub_originals(folder, thumbs_folder):
+    scrubbed, unreadable = [], []
+    for shard in sorted(os.listdir(folder)):
+        shard_path = os.path.join(folder, shard)
+        if len(shard) != 2 or not os.path.isdir(shard_path):
+            continue
+        for name in sorted(os.listdir(shard_path)):
+            key = f"{shard}/{name}"
+            path = os.path.join(shard_path, name)
+            if not BLOB_RE.match(key):
+                continue
+            try:
+                strip_metadata(path, path + ".part")
+                os.replace(path + ".part", path)
+                make_thumbnails(path, thumbs_folder, key)
+                scrubbed.append(key)
+            except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+                unreadable.append(key)
+            finally:
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+    return scrubbed, unreadable
+
+
+# "<name>_<size>.<fmt>", thumbnails live in their own folder next to the originals
+def thumbnail_name(filename, size, fmt):
+    return f"{os.path.splitext(filename)[0]}_{size}.{fmt}"
+
+# Smallest size that still covers width, the largest if none does
+def pick_size(width):
+    for size in AVATAR_SIZES:
+        if size >= width:
+            return size
+    return AVATAR_SIZES[-1]
+
+
+def make_thumbnails(source, thumbs_folder, filename):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)  # Applying camera rotation before EXIF is dropped
+        image = image.convert("RGB")
+        image.info = {}     # save() would carry some of it over (e.g. JPEG comments)
+        for size in AVATAR_SIZES:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            for fmt, pil_format in AVATAR_FORMATS.items():
+                path = os.path.join(thumbs_folder, thumbnail_name(filename, size, fmt))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Saved without exif/icc arguments or info, so no metadata is carried over
+                thumbnail.save(path + ".part", pil_format, quality=85)
+                os.replace(path + ".part", path)
+
+
+# One daemon thread per app worker, started on first upload (after gunicorn forks)
+class Thumbnailer:
+    def __init__(self, upload_folder, thumbs_folder, logger):
+        self.upload_folder = upload_folder
+        self.thumbs_folder = thumbs_folder
+        self.logger = logger
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, filename):
+        with self.lock:
+            if self.thread is None:
+                os.makedirs(self.thumbs_folder, exist_ok=True)
+                self.thread = threading.Thread(target=self._work, name="thumbnailer", daemon=True)
+                self.thread.start()
+        self.jobs.put(filename)
+
+    def _work(self):
+        while True:
+            filename = self.jobs.get()
+            try:
+                make_thumbnails(os.path.join(self.upload_folder, filename), self.thumbs_folder, filename)
+            except Exception:
+                # Unreadable after all, the (re-encoded) original keeps being served
+                self.logger.exception("Thumbnails failed for %s", filename)
+            finally:
+                self.jobs.task_done()
@@ -0,0 +1,82 @@
+import os
+import time
+
+from flask import g, got_request_exception, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+
+""" METRICS """
+# Prometheus metrics per Flask endpoint, served in text format by /metrics
+    # Under gunicorn PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py): every worker writes
+    # its values to mmap'd files in that folder and a scrape adds them up across workers
+    # Cache hit rate = rate(flasker_cache_hits_total) / (hits + misses), a ratio gauge can't be summed
+
+REQUEST_LATENCY = Histogram("flasker_request_duration_seconds", "Request latency by endpoint", ["endpoint"],
+                            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+REQUESTS = Counter("flasker_requests_total", "Requests by endpoint and status", ["endpoint", "method", "status"])
+EXCEPTIONS = Counter("flasker_request_exceptions_total", "Unhandled exceptions by endpoint", ["endpoint"])
+DB_CONNECTIONS_IN_USE = Gauge("flasker_db_connections_in_use", "Pooled DB connections checked out",
+                              multiprocess_mode="livesum")
+DB_CONNECTIONS_OPEN = Gauge("flasker_db_connections_open", "DB connections held by the pools",
+                            multiprocess_mode="livesum")
+CACHE_HITS = Counter("flasker_cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = Counter("flasker_cache_misses_total", "Cache misses", ["cache"])
+
+
+# Requests without a route share one label so bad URLs can't blow up the series count
+def endpoint_label():
+    return request.endpoint or "unmatched"
+
+
+class Metrics:
+    def __init__(self, app, engine, caches):
+        self.caches = caches    # name -> object with hits/misses counts
+        self.synced = {name: (0, 0) for name in caches}
+
+        self.watch(engine)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        got_request_exception.connect(self._exception, app)
+
+    # Pool events keep the gauges live instead of sampling them
+        # Called again for any other engine (e.g. the async one, see asgi.py)
+    def watch(self, engine):
+        event.listen(engine, "checkout", lambda *args: DB_CONNECTIONS_IN_USE.inc())
+        event.listen(engine, "checkin", lambda *args: DB_CONNECTIONS_IN_USE.dec())
+        event.listen(engine, "connect", lambda *args: DB_CONNECTIONS_OPEN.inc())
+        event.listen(engine, "close", lambda *args: DB_CONNECTIONS_OPEN.dec())
+
+    def _start(self):
+        g.metrics_start = time.perf_counter()
+
+    def _finish(self, response):
+        if "metrics_start" in g:
+            endpoint = endpoint_label()
+            REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - g.metrics_start)
+            REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        self._sync_caches()
+        return response
+
+    def _exception(self, sender, exception, **extra):
+        EXCEPTIONS.labels(endpoint_label()).inc()
+
+    # The caches count in plain ints, only the change since last time goes to the counters
+    def _sync_caches(self):
+        for name, cache in self.caches.items():
+            hits, misses = self.synced[name]
+            if cache.hits != hits:
+                CACHE_HITS.labels(name).inc(cache.hits - hits)
+            if cache.misses != misses:
+                CACHE_MISSES.labels(name).inc(cache.misses - misses)
+            self.synced[name] = (cache.hits, cache.misses)
+
+
+# Body & headers for the /metrics route
+def render_metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {"Content-Type": CONTENT_TYPE_LATEST}
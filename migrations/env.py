@@ -90,9 +90,21 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the full-text search objects are created with raw SQL by the
+    # "posts full text search" migration and have no model, so autogenerate
+    # must not try to drop them
+    def include_name(name, type_, parent_names):
+        if type_ == "table":
+            return not name.startswith("posts_fts")
+        if type_ == "index":
+            return name != "ix_posts_search"
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_name") is None:
+        conf_args["include_name"] = include_name
 
     connectable = get_engine()
 
@@ -0,0 +1,73 @@
+"""Posts full text search
+
+Revision ID: 3c9e1f0b7d24
+Revises: ed961e482254
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f0b7d24'
+down_revision = 'ed961e482254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # FTS5 index reading its text from posts (external content), kept in sync by triggers
+        op.execute("""
+            CREATE VIRTUAL TABLE posts_fts USING fts5(
+                title, slug, content,
+                content='posts', content_rowid='id'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts(rowid, title, slug, content)
+                VALUES (new.id, new.title, new.slug, new.content);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, slug, content)
+                VALUES ('delete', old.id, old.title, old.slug, old.content);
+            END
+        """)
+        # Only when the indexed text changes, not on counter, author name or derived content updates
+        op.execute("""
+            CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, slug, content ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, slug, content)
+                VALUES ('delete', old.id, old.title, old.slug, old.content);
+                INSERT INTO posts_fts(rowid, title, slug, content)
+                VALUES (new.id, new.title, new.slug, new.content);
+            END
+        """)
+        # Indexing existing posts
+        op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+
+    elif dialect == 'postgresql':
+        # Expression index, Postgres keeps it in sync on every write
+            # Must match the expression used by search_statement() in helpers.py
+        op.execute("""
+            CREATE INDEX ix_posts_search ON posts
+            USING GIN (to_tsvector('english', title || ' ' || slug || ' ' || content))
+        """)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_insert")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
+
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_posts_search")
@@ -0,0 +1,31 @@
+"""Server-side sessions
+
+Revision ID: a7c3e5f9b218
+Revises: f2a6d8c1b473
+Create Date: 2026-10-18 19:02:47.315604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f9b218'
+down_revision = 'f2a6d8c1b473'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sessions',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sessions_expires_at', 'sessions', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sessions_expires_at', table_name='sessions')
+    op.drop_table('sessions')
@@ -0,0 +1,35 @@
+"""FTS update trigger on indexed columns only
+
+Revision ID: b8e4d1f6a3c5
+Revises: a7c3e5f9b218
+Create Date: 2026-10-18 21:14:09.482317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4d1f6a3c5'
+down_revision = 'a7c3e5f9b218'
+branch_labels = None
+depends_on = None
+
+
+# Databases already past 3c9e1f0b7d24 have an update trigger firing on any column of posts
+    # Counter, author name & backfill updates re-indexed the post for nothing (the migration now makes this one)
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_update")
+        op.execute("""
+            CREATE TRIGGER posts_fts_update AFTER UPDATE OF title, slug, content ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, slug, content)
+                VALUES ('delete', old.id, old.title, old.slug, old.content);
+                INSERT INTO posts_fts(rowid, title, slug, content)
+                VALUES (new.id, new.title, new.slug, new.content);
+            END
+        """)
+
+
+def downgrade():
+    pass    # The narrower trigger is what 3c9e1f0b7d24 creates too
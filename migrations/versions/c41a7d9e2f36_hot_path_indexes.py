@@ -0,0 +1,30 @@
+"""Hot path indexes
+
+Revision ID: c41a7d9e2f36
+Revises: 9b4d2e6a1c57
+Create Date: 2026-10-18 12:20:05.117842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41a7d9e2f36'
+down_revision = '9b4d2e6a1c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain CREATE INDEX instead of batch mode, recreating posts on SQLite
+        # would drop the posts_fts triggers
+    op.create_index('ix_posts_date_posted_id', 'posts', ['date_posted', 'id'], unique=False)
+    op.create_index('ix_posts_poster_id_date_posted', 'posts', ['poster_id', 'date_posted'], unique=False)
+    op.create_index('ix_users_date_added', 'users', ['date_added'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_date_added', table_name='users')
+    op.drop_index('ix_posts_poster_id_date_posted', table_name='posts')
+    op.drop_index('ix_posts_date_posted_id', table_name='posts')
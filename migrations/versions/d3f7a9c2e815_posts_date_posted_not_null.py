@@ -0,0 +1,31 @@
+"""Posts date_posted not null
+
+Revision ID: d3f7a9c2e815
+Revises: b8e4d1f6a3c5
+Create Date: 2026-10-19 10:26:43.915270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7a9c2e815'
+down_revision = 'b8e4d1f6a3c5'
+branch_labels = None
+depends_on = None
+
+
+# The feed's cursors & every post listing read date_posted, a NULL one broke them
+    # Undated rows take their last edit time (or now)
+def upgrade():
+    op.execute("UPDATE posts SET date_posted = coalesce(date_updated, CURRENT_TIMESTAMP) WHERE date_posted IS NULL")
+    # No batch mode on SQLite, recreating posts would drop the posts_fts triggers
+        # New SQLite databases get the constraint from the model, imports fill missing dates (see data_transfer.py)
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('posts', 'date_posted', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.alter_column('posts', 'date_posted', existing_type=sa.DateTime(), nullable=True)
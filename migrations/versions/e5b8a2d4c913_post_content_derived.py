@@ -0,0 +1,33 @@
+"""Post content derived
+
+Revision ID: e5b8a2d4c913
+Revises: c41a7d9e2f36
+Create Date: 2026-10-18 14:02:51.306417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8a2d4c913'
+down_revision = 'c41a7d9e2f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ALTER TABLE instead of batch mode, recreating posts on SQLite
+        # would drop the posts_fts triggers
+    # Existing rows stay NULL until "flask backfill-content"
+    op.add_column('posts', sa.Column('content_html', sa.Text(), nullable=True))
+    op.add_column('posts', sa.Column('excerpt', sa.String(length=300), nullable=True))
+    op.add_column('posts', sa.Column('word_count', sa.Integer(), nullable=True))
+    op.add_column('posts', sa.Column('reading_minutes', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('posts', 'reading_minutes')
+    op.drop_column('posts', 'word_count')
+    op.drop_column('posts', 'excerpt')
+    op.drop_column('posts', 'content_html')
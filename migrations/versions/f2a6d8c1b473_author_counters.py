@@ -0,0 +1,38 @@
+"""Author counters
+
+Revision ID: f2a6d8c1b473
+Revises: e5b8a2d4c913
+Create Date: 2026-10-18 15:11:36.482905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d8c1b473'
+down_revision = 'e5b8a2d4c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ALTER TABLE instead of batch mode, recreating posts on SQLite
+        # would drop the posts_fts triggers
+    op.add_column('posts', sa.Column('author_name', sa.String(length=200), nullable=True))
+    op.add_column('users', sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('last_posted_at', sa.DateTime(), nullable=True))
+
+    # Filling the copies from the existing rows (same as "flask reconcile-counters")
+    op.execute("""
+        UPDATE users SET
+            post_count = (SELECT count(*) FROM posts WHERE posts.poster_id = users.id),
+            last_posted_at = (SELECT max(date_posted) FROM posts WHERE posts.poster_id = users.id)
+    """)
+    op.execute("UPDATE posts SET author_name = (SELECT name FROM users WHERE users.id = posts.poster_id)")
+
+
+def downgrade():
+    op.drop_column('users', 'last_posted_at')
+    op.drop_column('users', 'post_count')
+    op.drop_column('posts', 'author_name')
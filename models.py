@@ -0,0 +1,88 @@
+from datetime import datetime
+from flask_login import UserMixin
+
+from extensions import db, password_hasher
+from post_content import render_content
+
+
+""" MODELS """
+# Users Model
+class Users(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(20), nullable=False, unique=True)
+    name = db.Column(db.String(200), nullable=False)
+    email = db.Column(db.String(120), nullable=False, unique=True)
+    fav_color = db.Column(db.String(120))
+    date_added = db.Column(db.DateTime, default=datetime.now, index=True)  # Admin list order
+    date_updated = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    password_hash = db.Column(db.String(128), nullable=False)
+    # Users can have multiple posts (One to Many)
+    posts = db.relationship('Posts', back_populates='poster')
+    # Copies of what's in posts, kept in step by the post routes (see count_post)
+        # "flask reconcile-counters" repairs any drift
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_posted_at = db.Column(db.DateTime)
+    about_author = db.Column(db.Text(500), nullable=True)
+    profile_pic = db.Column(db.String(), nullable=True)
+
+    # A way to add a constraint at the db level would need -
+        # from sqlalchemy import CheckConstraint
+    """__table_args__ = (
+        CheckConstraint("length(name) <= 200", name="check_name_length"),
+    )
+    """
+
+    # Password hashing
+    @property
+    def password(self):
+        raise AttributeError("Password is not a readable attribute!")
+
+    @password.setter
+    def password(self, password):
+        self.password_hash = password_hasher.hash(password)
+
+    def verify_password(self, password):
+        return password_hasher.check(self.password_hash, password)
+
+    # Repr
+    def __repr__(self):
+        return '<Name %r>' % self.name
+
+# Post Model
+class Posts(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    # author = db.Column(db.String(255), nullable=False)    # Removed
+    slug = db.Column(db.String(255), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    # Derived from content when the post is written (see set_content), NULL until backfilled
+    content_html = db.Column(db.Text)   # Sanitized, what the post page renders
+    excerpt = db.Column(db.String(300)) # Plain text, what the feed renders
+    word_count = db.Column(db.Integer)
+    reading_minutes = db.Column(db.Integer)
+    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.now)    # Feed order & cursors, never NULL
+    date_updated = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    poster_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    author_name = db.Column(db.String(200))     # Copy of Users.name, listings show it without loading the author
+    # Declared here rather than as a backref so Posts.poster exists before the first query
+        # (the feed and conditional GET queries use it at class level)
+    poster = db.relationship('Users', back_populates='posts')
+
+    # Indexes for the hot sorts & filters (username/email are covered by their unique constraints)
+    __table_args__ = (
+        db.Index("ix_posts_date_posted_id", "date_posted", "id"),           # Feed order & keyset cursors
+        db.Index("ix_posts_poster_id_date_posted", "poster_id", "date_posted"), # An author's posts (also poster_id alone)
+    )
+
+    # Content & the fields derived from it (post_content.py), done once here instead of on every render
+    def set_content(self, content):
+        self.content = content
+        for field, value in render_content(content).items():
+            setattr(self, field, value)
+
+
+# Server-side sessions (see session_store.py), id is a hash of the cookie's session id
+class Sessions(db.Model):
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)     # Bulk purge of expired sessions
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+""" PASSWORD HASHING """
+# Password hashes are deliberately slow, this runs them in a small process pool
+    # so the CPU work happens outside the request's process and GIL
+    # Calls still wait for their result, but at most max_pending can be queued per worker,
+    # past that HasherBusy is raised straight away instead of piling up requests
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, method, workers, max_pending):
+        self.method = method        # werkzeug method string, e.g. "scrypt:32768:8:1"
+        # As werkzeug writes it in hashes, short names spelled out with their default cost ("scrypt" -> "scrypt:32768:8:1")
+        self.prefix = generate_password_hash("", method).split("$", 1)[0]
+        self.workers = workers      # 0 hashes in the calling thread
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.executor = None        # Created on first use, after gunicorn has forked
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, pw_hash, password):
+        return self._run(check_password_hash, pw_hash, password)
+
+    # Hash made with other settings than the current ones (method & cost live before the first $)
+    def needs_rehash(self, pw_hash):
+        return pw_hash.split("$", 1)[0] != self.prefix
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise HasherBusy()
+            self.pending += 1
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    initializer=exit_with_parent, initargs=(os.getpid(),))
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+
+# Run in each pool process: exits once the app worker is gone, even a worker killed without cleaning up
+    # (e.g. SIGKILL after gunicorn's graceful timeout), the pool's own shutdown never runs then
+def exit_with_parent(parent_pid):
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    threading.Thread(target=watch, name="parent-watch", daemon=True).start()
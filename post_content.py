@@ -0,0 +1,129 @@
+import html
+import math
+import re
+from html.parser import HTMLParser
+
+
+""" POST CONTENT """
+# Everything derived from a post's HTML, computed once when the post is written
+    # content_html: the CKEditor HTML with only ALLOWED_TAGS & ALLOWED_ATTRIBUTES, safe to render with |safe
+    # excerpt: plain text cut at a word near EXCERPT_CHARS, shown in the feed
+    # word_count & reading_minutes at WORDS_PER_MINUTE
+
+ALLOWED_TAGS = {"p", "br", "hr", "strong", "b", "em", "i", "u", "s", "sub", "sup", "span", "div",
+                "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "code",
+                "ul", "ol", "li", "a", "img", "table", "thead", "tbody", "tr", "th", "td", "figure", "figcaption"}
+ALLOWED_ATTRIBUTES = {"a": {"href", "title"},
+                      "img": {"src", "alt", "width", "height"},
+                      "ol": {"start"},
+                      "th": {"colspan", "rowspan"},
+                      "td": {"colspan", "rowspan"}}
+URL_ATTRIBUTES = {"href", "src"}
+URL_SCHEMES = {"http", "https", "mailto"}
+VOID_TAGS = {"br", "hr", "img"}
+# Dropped along with everything inside them
+DROPPED_TAGS = {"script", "style", "template", "noscript", "iframe", "object", "embed", "svg", "math"}
+# Ending one of these separates words in the plain text
+BLOCK_TAGS = {"p", "br", "hr", "div", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre",
+              "li", "tr", "td", "th", "figcaption"}
+
+EXCERPT_CHARS = 280
+WORDS_PER_MINUTE = 200
+
+SCHEME_RE = re.compile(r"^([a-z][a-z0-9+.-]*):")
+URL_JUNK_RE = re.compile(r"[\x00-\x20]+")   # Browsers ignore these inside URLs ("java\tscript:")
+SPACE_RE = re.compile(r"\s+")
+
+
+# Rebuilds the HTML from parser events, anything not allowed never makes it to the output
+class Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropping = 0   # Depth inside DROPPED_TAGS
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(" ")
+        allowed = ALLOWED_ATTRIBUTES.get(tag, ())
+        kept = "".join(f' {name}="{html.escape(value, quote=True)}"' for name, value in attrs
+                       if name in allowed and value is not None and safe_value(name, value))
+        self.html.append(f"<{tag}{kept}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in DROPPED_TAGS:
+            self.handle_starttag(tag, attrs)
+            if tag not in VOID_TAGS and tag in self.open_tags:
+                self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Closing whatever was left open inside it, the output stays well nested
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+        if tag in BLOCK_TAGS:
+            self.text.append(" ")
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.html.append(html.escape(data, quote=False))
+            self.text.append(data)
+
+    def close(self):
+        super().close()
+        self.html.extend(f"</{tag}>" for tag in reversed(self.open_tags))
+        self.open_tags = []
+
+
+def safe_value(name, value):
+    if name not in URL_ATTRIBUTES:
+        return True
+    scheme = SCHEME_RE.match(URL_JUNK_RE.sub("", value).lower())
+    return scheme is None or scheme.group(1) in URL_SCHEMES    # Relative URLs have no scheme
+
+
+def parse(content):
+    sanitizer = Sanitizer()
+    sanitizer.feed(content or "")
+    sanitizer.close()
+    return "".join(sanitizer.html), SPACE_RE.sub(" ", "".join(sanitizer.text)).strip()
+
+
+def sanitize_html(content):
+    return parse(content)[0]
+
+def excerpt(content):
+    return make_excerpt(parse(content)[1])
+
+
+def make_excerpt(text):
+    if len(text) <= EXCERPT_CHARS:
+        return text
+    cut = text[:EXCERPT_CHARS].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+# Values for the Posts columns of the same names
+def render_content(content):
+    content_html, text = parse(content)
+    word_count = len(text.split())
+    return {"content_html": content_html,
+            "excerpt": make_excerpt(text),
+            "word_count": word_count,
+            "reading_minutes": max(1, math.ceil(word_count / WORDS_PER_MINUTE))}
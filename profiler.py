@@ -0,0 +1,134 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+
+""" REQUEST PROFILER """
+# Per request SQL count, DB time, repeated statements and template render time
+    # Repeated statements are the N+1 pattern (the same SELECT once per row)
+    # Over QUERY_BUDGET a request is logged, or raises when QUERY_BUDGET_MODE = "raise" (tests)
+    # Totals per endpoint are kept per worker and served as JSON by the admin profile route
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# Same statement with different values -> same fingerprint
+    # Bound parameters are already "?", this folds expanded IN lists and whitespace
+IN_LIST_RE = re.compile(r"\((?:\s*[?%][^,()]*,)+\s*[?%][^,()]*\)")
+SPACE_RE = re.compile(r"\s+")
+
+def fingerprint(statement):
+    return SPACE_RE.sub(" ", IN_LIST_RE.sub("(?)", statement)).strip()
+
+
+class RequestProfiler:
+    def __init__(self, app, engine):
+        self.app = app
+        self.lock = threading.Lock()
+        self.endpoints = {}     # endpoint -> totals
+
+        self.watch(engine)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # Counting the queries of another engine too (e.g. the async one, see asgi.py)
+    def watch(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_query)
+        event.listen(engine, "after_cursor_execute", self._after_query)
+
+    """ HOOKS """
+    def _start(self):
+        g.profile = {"start": time.perf_counter(),
+                     "queries": 0,
+                     "db_time": 0.0,
+                     "render_time": 0.0,
+                     "renders": [],
+                     "statements": Counter()}
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "profile" in g:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "profile" in g and conn.info.get("profile_start"):
+            profile = g.profile
+            profile["queries"] += 1
+            profile["db_time"] += time.perf_counter() - conn.info["profile_start"].pop()
+            profile["statements"][fingerprint(statement)] += 1
+
+    def _before_render(self, sender, template, context, **extra):
+        if "profile" in g:
+            g.profile["renders"].append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if "profile" in g and g.profile["renders"]:
+            started = g.profile["renders"].pop()
+            if not g.profile["renders"]:    # Outermost template only, includes are part of it
+                g.profile["render_time"] += time.perf_counter() - started
+
+    def _finish(self, response):
+        profile = g.pop("profile", None)
+        if profile is None or request.endpoint is None:
+            return response
+
+        total = time.perf_counter() - profile["start"]
+        repeated = {statement: count for statement, count in profile["statements"].items() if count > 1}
+        self._record(request.endpoint, profile, total, repeated)
+
+        if self.app.config['PROFILER_HEADERS']:
+            # Shows up in the browser dev tools (network tab -> timing)
+            response.headers["Server-Timing"] = (f"db;dur={profile['db_time'] * 1000:.1f};desc=\"{profile['queries']} queries\", "
+                                                 f"render;dur={profile['render_time'] * 1000:.1f}, "
+                                                 f"total;dur={total * 1000:.1f}")
+
+        budget = self.app.config['QUERY_BUDGETS'].get(request.endpoint, self.app.config['QUERY_BUDGET'])
+        if profile["queries"] > budget:
+            message = (f"{request.endpoint} ran {profile['queries']} queries (budget {budget}), "
+                       f"repeated: {repeated or 'none'}")
+            if self.app.config['QUERY_BUDGET_MODE'] == "raise":
+                raise QueryBudgetExceeded(message)
+            self.app.logger.warning(message)
+        return response
+
+    """ TOTALS """
+    def _record(self, endpoint, profile, total, repeated):
+        with self.lock:
+            totals = self.endpoints.setdefault(endpoint, {"requests": 0,
+                                                          "queries": 0,
+                                                          "max_queries": 0,
+                                                          "db_time": 0.0,
+                                                          "render_time": 0.0,
+                                                          "total_time": 0.0,
+                                                          "repeated": Counter()})
+            totals["requests"] += 1
+            totals["queries"] += profile["queries"]
+            totals["max_queries"] = max(totals["max_queries"], profile["queries"])
+            totals["db_time"] += profile["db_time"]
+            totals["render_time"] += profile["render_time"]
+            totals["total_time"] += total
+            for statement, count in repeated.items():
+                totals["repeated"][statement] += count
+
+    # Averages per endpoint (ms), slowest first
+    def summary(self):
+        with self.lock:
+            rows = []
+            for endpoint, totals in self.endpoints.items():
+                requests = totals["requests"]
+                rows.append({"endpoint": endpoint,
+                             "requests": requests,
+                             "avg_queries": round(totals["queries"] / requests, 2),
+                             "max_queries": totals["max_queries"],
+                             "avg_db_ms": round(totals["db_time"] / requests * 1000, 2),
+                             "avg_render_ms": round(totals["render_time"] / requests * 1000, 2),
+                             "avg_total_ms": round(totals["total_time"] / requests * 1000, 2),
+                             "repeated_statements": dict(totals["repeated"].most_common(5))})
+        return sorted(rows, key=lambda row: row["avg_total_ms"], reverse=True)
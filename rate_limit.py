@@ -0,0 +1,198 @@
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+
+""" RATE LIMITING """
+# Token buckets for the routes that cost a password hash or a full-text search (see RATE_LIMITS in config.py)
+    # A limit (requests, seconds) allows bursts of that many requests, refilled evenly over the seconds
+    # One bucket per client IP, one per account tried from that IP (the submitted username/email) and one per user
+    # once logged in
+    # The IP & account buckets are checked before the view runs, a throttled client gets a 429 with Retry-After
+    # without any query, session load or hash, only the user bucket needs the session
+    # The account bucket only loses tokens on failed attempts (the view calls failed_attempt()) and is kept per
+    # client, so posting someone's username over and over never locks them out of their own account
+    # Trouble with the store lets requests through, a limiter must never take the login down
+
+PURGE_INTERVAL = 60     # Seconds between deletes of idle buckets per worker
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+""" STORES """
+# Same method for every store: take(key, capacity, rate, now, cost) -> seconds until a token is back, 0 when granted
+    # cost 0 only looks: granted if a whole token is there, none taken
+    # Both also have purge(before), dropping buckets not used since (they are full again by then)
+
+# SQLite file shared by every worker of this host, one atomic statement per check
+    # Its own file, apart from the app's database, so checks never wait on the app's writes
+    # Deployed on several hosts, each one counts its own clients (with a load balancer in front, limits multiply)
+class SQLiteBucketStore:
+    # Refilled tokens, then cost taken if there is a whole one
+        # UPDATE SET reads the row as it was, so every expression starts from the old tokens & stamp
+    TAKE_SQL = """
+        INSERT INTO buckets (key, tokens, stamp, granted) VALUES (:key, :capacity - :cost, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:capacity, tokens + max(0, :now - stamp) * :rate)
+                     - (min(:capacity, tokens + max(0, :now - stamp) * :rate) >= 1) * :cost,
+            granted = min(:capacity, tokens + max(0, :now - stamp) * :rate) >= 1,
+            stamp = max(stamp, :now)
+        RETURNING tokens, granted"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()  # sqlite3 connections stay in their thread, opened after gunicorn forks
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)   # Autocommit
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")    # Buckets lost in a crash only reset some limits
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets "
+                               "(key TEXT PRIMARY KEY, tokens REAL, stamp REAL, granted INTEGER) WITHOUT ROWID")
+            connection.execute("CREATE INDEX IF NOT EXISTS buckets_stamp ON buckets (stamp)")
+            self.local.connection = connection
+        return connection
+
+    def take(self, key, capacity, rate, now, cost=1):
+        tokens, granted = self.connection().execute(
+            self.TAKE_SQL, {"key": key, "capacity": capacity, "rate": rate, "now": now, "cost": cost}).fetchone()
+        return 0 if granted else (1 - tokens) / rate
+
+    def purge(self, before):
+        return self.connection().execute("DELETE FROM buckets WHERE stamp < ?", (before,)).rowcount
+
+
+# Per process, limits are per worker (development, tests or a single worker)
+class MemoryBucketStore:
+    def __init__(self):
+        self.buckets = {}   # key -> [tokens, stamp]
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now, cost=1):
+        with self.lock:
+            bucket = self.buckets.setdefault(key, [capacity, now])
+            bucket[0] = min(capacity, bucket[0] + max(0, now - bucket[1]) * rate)
+            bucket[1] = max(bucket[1], now)
+            if bucket[0] >= 1:
+                bucket[0] -= cost
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def purge(self, before):
+        with self.lock:
+            idle = [key for key, (_, stamp) in self.buckets.items() if stamp < before]
+            for key in idle:
+                del self.buckets[key]
+        return len(idle)
+
+
+""" LIMITER """
+# Kept in app.extensions['rate_limiter'] by create_app, None when RATE_LIMIT_BACKEND is "off"
+class RateLimiter:
+    def __init__(self, store, limits, proxies, logger):
+        # name -> (capacity, tokens per second)
+        self.limits = {name: (requests, requests / seconds) for name, (requests, seconds) in limits.items()}
+        self.idle = max((seconds for _, seconds in limits.values()), default=0)    # Any bucket is full again after it
+        self.store = store
+        self.proxies = proxies
+        self.logger = logger
+        self.next_purge = 0
+
+    # Raises RateLimited when the bucket of name & key is empty
+        # cost 0 only checks it (see charge)
+    def hit(self, name, key, cost=1):
+        wait = self.take(name, key, cost)
+        if wait:
+            raise RateLimited(math.ceil(wait))
+
+    # Takes a token without failing the request, already checked by hit(name, key, 0)
+    def charge(self, name, key):
+        self.take(name, key, 1)
+
+    # Seconds to wait, 0 when granted
+    def take(self, name, key, cost):
+        if name not in self.limits:
+            return 0
+        capacity, rate = self.limits[name]
+        now = time.time()
+        try:
+            wait = self.store.take(f"{name}:{key}", capacity, rate, now, cost)
+            if now >= self.next_purge:
+                self.next_purge = now + PURGE_INTERVAL
+                self.store.purge(now - self.idle)
+        except Exception:
+            self.logger.exception("Rate limit store failed, request let through")
+            return 0
+        return wait
+
+    # Behind proxies adding X-Forwarded-For (RATE_LIMIT_PROXIES), the client is the address the first of them saw
+        # Anything further left in the header is up to the client, so never trusted
+    def client_ip(self):
+        forwarded = [ip.strip() for ip in request.headers.get("X-Forwarded-For", "").split(",") if ip.strip()]
+        if self.proxies and len(forwarded) >= self.proxies:
+            return forwarded[-self.proxies]
+        return request.remote_addr
+
+    # account: form field naming the account the request acts on, if any
+        # Its bucket is only checked here, failed_attempt() takes the token
+    def limit_client(self, name, account=None):
+        client = str(self.client_ip())
+        self.hit(name, "ip:" + client)
+        tried = request.form.get(account, "").strip().lower() if account else ""
+        if tried:
+            key = f"account:{tried}:{client}"
+            self.hit(name, key, 0)
+            g.rate_limit_account = (name, key)
+
+    def limit_user(self, name):
+        if current_user.is_authenticated:
+            self.hit(name, f"user:{current_user.id}")
+
+
+def make_limiter(config, logger):
+    if config['RATE_LIMIT_BACKEND'] == "off":
+        return None
+    if config['RATE_LIMIT_BACKEND'] == "memory":
+        store = MemoryBucketStore()
+    else:
+        store = SQLiteBucketStore(config['RATE_LIMIT_PATH'])
+    return RateLimiter(store, config['RATE_LIMITS'], config['RATE_LIMIT_PROXIES'], logger)
+
+
+# Called by a limited view when the account tried didn't work out (wrong password, email already registered)
+def failed_attempt():
+    limiter = current_app.extensions.get('rate_limiter')
+    account = g.pop("rate_limit_account", None)
+    if limiter and account:
+        limiter.charge(*account)
+
+
+""" ROUTE DECORATOR """
+# @rate_limit("login", account="username") under the route, the limit is RATE_LIMITS["login"]
+    # Only the methods doing the costly work count (the form page itself is free)
+    # asgi.py applies the same limits to its async views through the view's rate_limit attribute
+def rate_limit(name, methods=("POST",), account=None):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter and request.method in methods:
+                limiter.limit_client(name, account)
+                limiter.limit_user(name)
+            return view(*args, **kwargs)
+        wrapper.rate_limit = (name, methods, account)
+        return wrapper
+    return decorator
@@ -0,0 +1,327 @@
+import fcntl
+import gzip
+import heapq
+import html
+import json
+import math
+import os
+import pickle
+import re
+import secrets
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+""" IN-PROCESS SEARCH INDEX """
+# Pure Python inverted index over posts for when the DB has no full-text engine
+    # Ranking is BM25, a trailing * on a word matches every term starting with it
+
+# Snapshot format version, bump when the pickled layout changes
+SNAPSHOT_VERSION = 2
+
+# BM25 tuning (usual defaults)
+K1 = 1.5
+B = 0.75
+
+TAG_RE = re.compile(r"<[^>]+>")
+WORD_RE = re.compile(r"\w+")
+
+
+# CKEditor content is HTML, only the text between tags is searchable
+def strip_html(content):
+    return html.unescape(TAG_RE.sub(" ", content or ""))
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}      # term -> {post id: term frequency}
+        self.doc_terms = {}     # post id -> terms in it (needed to unindex)
+        self.doc_lengths = {}   # post id -> number of tokens
+        self.total_length = 0
+        self._vocabulary = None # Sorted terms for prefix lookups, rebuilt lazily
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    # Adding or re-indexing a post
+    def add(self, post_id, title, slug, content):
+        self.remove(post_id)
+        tokens = tokenize(" ".join([title or "", slug or "", strip_html(content)]))
+
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self._vocabulary = None
+            self.postings[term][post_id] = frequency
+
+        self.doc_terms[post_id] = tuple(frequencies)
+        self.doc_lengths[post_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, post_id):
+        if post_id not in self.doc_lengths:
+            return
+        for term in self.doc_terms.pop(post_id):
+            posting = self.postings[term]
+            del posting[post_id]
+            if not posting:
+                del self.postings[term]
+                self._vocabulary = None
+        self.total_length -= self.doc_lengths.pop(post_id)
+
+    # Terms starting with prefix, found by bisecting the sorted vocabulary
+    def expand_prefix(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        terms = []
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            terms.append(self._vocabulary[position])
+            position += 1
+        return terms
+
+    # Returns post ids, best match first
+    def search(self, query, limit=50):
+        if not self.doc_lengths:
+            return []
+
+        terms = set()
+        for word in query.lower().split():
+            if word.endswith("*"):
+                for prefix in tokenize(word[:-1]):
+                    terms.update(self.expand_prefix(prefix))
+            else:
+                terms.update(term for term in tokenize(word) if term in self.postings)
+
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count
+        scores = {}
+        for term in terms:
+            posting = self.postings[term]
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for post_id, frequency in posting.items():
+                norm = K1 * (1 - B + B * self.doc_lengths[post_id] / average_length)
+                scores[post_id] = scores.get(post_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+    """ SNAPSHOTS """
+    # Written to a temp file first so readers never see a half-written snapshot
+        # generation names the delta log that continues it (see SharedSearchIndex)
+    def save(self, path, generation):
+        state = (SNAPSHOT_VERSION, generation, self.postings, self.doc_terms, self.doc_lengths, self.total_length)
+        temp_path = path + ".tmp"
+        with gzip.open(temp_path, "wb", compresslevel=1) as snapshot:
+            pickle.dump(state, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    # (index, generation) from an open snapshot file, None if it is from an older format
+    @classmethod
+    def load(cls, file):
+        try:
+            with gzip.open(file, "rb") as snapshot:
+                state = pickle.load(snapshot)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if state[0] != SNAPSHOT_VERSION:
+            return None
+
+        index = cls()
+        _, generation, index.postings, index.doc_terms, index.doc_lengths, index.total_length = state
+        return index, generation
+
+    # A record of the delta log: the post's text to (re)index, or only its id to remove it
+    def apply(self, record):
+        if "title" in record:
+            self.add(record["id"], record["title"], record["slug"], record["content"])
+        else:
+            self.remove(record["id"])
+
+
+""" SHARED INDEX """
+# One SearchIndex per worker, kept in step with the other workers through files next to SEARCH_INDEX_PATH
+    # <path>       snapshot of the whole index, only rewritten by compaction
+    # <path>.log   delta log continuing the snapshot: a header line, then one JSON record per post write
+    # <path>.lock  flock held shared to read the files, exclusive to append or replace them
+    # A write appends its record & applies it locally after catching up with the log, so every worker
+    # applies the same records in the same order and no write is lost
+    # Each search checks the log's size (one stat) and replays only the new records
+    # Once the log is over compact_bytes, a background thread folds it into a new snapshot:
+    # built outside the lock, then swapped in along with the records written meanwhile.
+    # The new log's header says where the old one was cut, so up to date workers carry on without reloading
+class SharedSearchIndex:
+    def __init__(self, path, compact_bytes, logger):
+        self.path = path
+        self.log_path = path + ".log"
+        self.lock_path = path + ".lock"
+        self.compact_bytes = compact_bytes
+        self.logger = logger
+        self.index = None
+        self.generation = None
+        self.log_inode = None   # The log file this worker is reading
+        self.offset = 0         # Bytes of it applied
+        self.lock = threading.RLock()   # self.index is changed in place, searches wait for it
+        self.compacting = False
+
+    @contextmanager
+    def file_lock(self, operation):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def search(self, query, limit=50):
+        with self.lock:
+            return self.index.search(query, limit) if self.index is not None else []
+
+    # Catches up with the files, False if there is no snapshot to start from (build needed)
+    def refresh(self):
+        with self.lock:
+            try:
+                stat = os.stat(self.log_path)
+                if self.index is not None and (stat.st_ino, stat.st_size) == (self.log_inode, self.offset):
+                    return True     # Nothing new, the usual case
+            except OSError:
+                pass
+            with self.file_lock(fcntl.LOCK_SH):
+                return self._sync()
+
+    # File lock held
+    def _sync(self):
+        try:
+            log = open(self.log_path, "rb")
+        except OSError:
+            self.index = None   # Reset (or never built)
+            return False
+        with log:
+            inode = os.fstat(log.fileno()).st_ino
+            if self.index is not None and inode == self.log_inode:
+                log.seek(self.offset)
+                return self._replay(log)
+
+            header_line = log.readline()
+            header = json.loads(header_line)
+            # Compacted from the log this worker had read far enough, no reload needed
+            if (self.index is not None and header.get("base") == self.generation
+                    and self.offset >= header["base_offset"]):
+                self.generation, self.log_inode = header["generation"], inode
+                self.offset = len(header_line) + self.offset - header["base_offset"]
+                log.seek(self.offset)
+                return self._replay(log)
+
+            try:
+                snapshot = open(self.path, "rb")
+            except OSError:
+                self.index = None
+                return False
+            with snapshot:
+                loaded = SearchIndex.load(snapshot)
+            if loaded is None or loaded[1] != header["generation"]:
+                self.index = None
+                return False
+            self.index, self.generation = loaded
+            self.log_inode, self.offset = inode, len(header_line)
+            return self._replay(log)
+
+    def _replay(self, log):
+        for line in log:
+            self.index.apply(json.loads(line))
+            self.offset += len(line)
+        return True
+
+    # Whole index from rows of (id, title, slug, content), when there is no snapshot yet or after a reset
+    def build(self, rows):
+        with self.lock, self.file_lock(fcntl.LOCK_EX):
+            if self._sync():
+                return      # Built by another worker meanwhile
+            index = SearchIndex()
+            for post_id, title, slug, content in rows():
+                index.add(post_id, title, slug, content)
+            header = {"generation": secrets.token_hex(8)}
+            index.save(f"{self.path}.{header['generation']}", header["generation"])
+            self._swap_files(header, b"")
+            self._sync()
+
+    # The snapshot saved as <path>.<generation> takes over, with a new log, file lock held
+    def _swap_files(self, header, records):
+        with open(self.log_path + ".tmp", "wb") as log:
+            log.write(json.dumps(header).encode() + b"\n" + records)
+        os.replace(f"{self.path}.{header['generation']}", self.path)
+        os.replace(self.log_path + ".tmp", self.log_path)
+
+    def reset(self):
+        with self.lock, self.file_lock(fcntl.LOCK_EX):
+            for path in (self.log_path, self.path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.index = None
+
+    def add(self, post_id, title, slug, content):
+        self.write({"id": post_id, "title": title, "slug": slug, "content": content})
+
+    def remove(self, post_id):
+        self.write({"id": post_id})
+
+    def write(self, record):
+        with self.lock:
+            with self.file_lock(fcntl.LOCK_EX):
+                if not self._sync():
+                    return  # No index yet, it will be built from the DB (the post is committed already)
+                line = json.dumps(record).encode() + b"\n"
+                with open(self.log_path, "ab") as log:
+                    log.write(line)
+                self.index.apply(record)
+                self.offset += len(line)
+            if self.offset > self.compact_bytes and not self.compacting:
+                self.compacting = True
+                threading.Thread(target=self.compact, name="search-index-compaction", daemon=True).start()
+
+    def compact(self):
+        try:
+            # One compaction at a time across workers, the others leave it to that one
+            with open(self.path + ".compact", "a") as compact_lock:
+                try:
+                    fcntl.flock(compact_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+                self._compact()
+        except Exception:
+            self.logger.exception("Compacting the search index failed")
+        finally:
+            self.compacting = False
+
+    def _compact(self):
+        # The snapshot & the log's length as they are now, the snapshot is read once the lock is released
+        with self.file_lock(fcntl.LOCK_SH):
+            snapshot = open(self.path, "rb")
+            with open(self.log_path, "rb") as log:
+                header_line = log.readline()
+                records = log.read()
+        base_offset = len(header_line) + len(records)
+        with snapshot:
+            index, generation = SearchIndex.load(snapshot)
+        for line in records.splitlines():
+            index.apply(json.loads(line))
+        new_header = {"generation": secrets.token_hex(8), "base": generation, "base_offset": base_offset}
+        index.save(f"{self.path}.{new_header['generation']}", new_header["generation"])
+
+        # Only the swap holds up the writers
+        with self.file_lock(fcntl.LOCK_EX):
+            with open(self.log_path, "rb") as log:
+                if log.readline() != header_line:
+                    os.remove(f"{self.path}.{new_header['generation']}")
+                    return  # Reset or compacted by another worker meanwhile
+                log.seek(base_offset)
+                written_since = log.read()
+            self._swap_files(new_header, written_since)
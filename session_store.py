@@ -0,0 +1,221 @@
+import hashlib
+import secrets
+import threading
+import time
+from datetime import datetime
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+
+
+""" SERVER-SIDE SESSIONS """
+# The session (Flask-Login's user id, flashes, CSRF token) is kept on the server, the cookie only holds a random id
+    # Loaded on first use, requests that never touch the session (static files, /metrics) do no I/O
+    # Written back only when its content changed, or to push back its expiry once half of it has passed
+    # The store is keyed by a hash of the id, so reading the table gives no usable cookies
+    # A new id is issued whenever the logged in user changes (no session fixation)
+    # Expired sessions are deleted in bulk by a background thread in each worker (or "flask purge-sessions")
+
+PURGE_BATCH = 1000  # Rows per DELETE, keeps each write lock short
+SERIALIZER = TaggedJSONSerializer()     # What Flask's cookie sessions use (tuples, Markup, datetimes...)
+
+
+def store_key(sid):
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+""" STORES """
+# Same methods for every store: load(key) -> (data, expires) or None, save, touch, delete, delete_expired
+
+# sessions table (models.Sessions) on SQLite or Postgres
+    # Own short transactions on the engine, apart from the request's db.session
+class DatabaseSessionStore:
+    def __init__(self, engine, table):
+        self.engine = engine
+        self.table = table
+
+    def load(self, key):
+        with self.engine.connect() as connection:
+            row = connection.execute(self.load_statement(key)).first()
+        return (row.data, row.expires_at) if row else None
+
+    # Also run on the async engine by asgi.py
+    def load_statement(self, key):
+        return self.table.select().where(self.table.c.id == key, self.table.c.expires_at > datetime.now())
+
+    def save(self, key, data, expires):
+        with self.engine.begin() as connection:
+            updated = connection.execute(self.table.update().where(self.table.c.id == key)
+                                         .values(data=data, expires_at=expires)).rowcount
+            if not updated:     # New, or purged since it was loaded
+                connection.execute(self.table.insert().values(id=key, data=data, expires_at=expires))
+
+    def touch(self, key, expires):
+        with self.engine.begin() as connection:
+            connection.execute(self.table.update().where(self.table.c.id == key).values(expires_at=expires))
+
+    def delete(self, key):
+        with self.engine.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.id == key))
+
+    def delete_expired(self, now):
+        deleted = 0
+        while True:
+            expired = self.table.select().with_only_columns(self.table.c.id) \
+                .where(self.table.c.expires_at <= now).limit(PURGE_BATCH)
+            with self.engine.begin() as connection:
+                count = connection.execute(self.table.delete().where(self.table.c.id.in_(expired.scalar_subquery()))).rowcount
+            deleted += count
+            if count < PURGE_BATCH:
+                return deleted
+
+
+# Local key-value stand-in, per process (development, tests or a single worker)
+class MemorySessionStore:
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        entry = self.entries.get(key)
+        return entry if entry and entry[1] > datetime.now() else None
+
+    def save(self, key, data, expires):
+        with self.lock:
+            self.entries[key] = (data, expires)
+
+    def touch(self, key, expires):
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = (self.entries[key][0], expires)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete_expired(self, now):
+        with self.lock:
+            expired = [key for key, (_, expires) in self.entries.items() if expires <= now]
+            for key in expired:
+                del self.entries[key]
+        return len(expired)
+
+
+""" SESSION """
+# A dict that reads the store on first use (see the method lists below)
+class ServerSession(dict, SessionMixin):
+    def __init__(self, store, sid):
+        super().__init__()
+        self.store = store
+        self.sid = sid          # None until first saved, also when the cookie's session is gone
+        self.cookie = sid       # What the client sent
+        self.loaded = False
+        self.accessed = False
+        self.modified = False
+        self.data = None        # Serialized as loaded, to tell if anything really changed
+        self.expires = None
+        self.user_id = None     # Flask-Login's user as loaded
+
+    def load(self):
+        self.accessed = True
+        if not self.loaded:
+            self.fill(self.store.load(store_key(self.sid)) if self.sid else None)
+
+    # (data, expires) as returned by store.load, or None
+    def fill(self, record):
+        self.loaded = True
+        if record is None:
+            self.sid = None
+        else:
+            self.data, self.expires = record
+            dict.update(self, SERIALIZER.loads(self.data))
+        self.user_id = dict.get(self, "_user_id")
+
+
+def reading(method):
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+def writing(method):
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        self.modified = True
+        return method(self, *args, **kwargs)
+    return wrapper
+
+for name in ("__getitem__", "__contains__", "__iter__", "__len__", "__repr__", "__eq__", "__ne__",
+             "get", "keys", "values", "items", "copy"):
+    setattr(ServerSession, name, reading(getattr(dict, name)))
+for name in ("__setitem__", "__delitem__", "clear", "pop", "popitem", "setdefault", "update"):
+    setattr(ServerSession, name, writing(getattr(dict, name)))
+
+
+""" SESSION INTERFACE """
+# Set as app.session_interface by create_app
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store, purge_interval, logger):
+        self.store = store
+        self.purge_interval = purge_interval
+        self.logger = logger
+        self.purger = None
+        self.lock = threading.Lock()
+
+    def open_session(self, app, request):
+        return ServerSession(self.store, request.cookies.get(self.get_cookie_name(app)))
+
+    def save_session(self, app, session, response):
+        if not session.loaded:
+            return      # Never used, nothing read or written
+        cookie = dict(domain=self.get_cookie_domain(app),
+                      path=self.get_cookie_path(app),
+                      secure=self.get_cookie_secure(app),
+                      partitioned=self.get_cookie_partitioned(app),
+                      samesite=self.get_cookie_samesite(app),
+                      httponly=self.get_cookie_httponly(app))
+        response.vary.add("Cookie")
+
+        # Emptied (logout) or unknown id, the record & the cookie go
+        if not session:
+            if session.sid:
+                self.store.delete(store_key(session.sid))
+            if session.cookie:
+                response.delete_cookie(self.get_cookie_name(app), **cookie)
+            return
+
+        now = datetime.now()
+        expires = now + app.permanent_session_lifetime
+        # Logged in or out with data left (e.g. a flash), moving it to a new id
+        if session.sid and dict.get(session, "_user_id") != session.user_id:
+            self.store.delete(store_key(session.sid))
+            session.sid = None
+
+        data = SERIALIZER.dumps(dict(session)) if session.modified or session.sid is None else session.data
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+            self.store.save(store_key(session.sid), data, expires)
+        elif data != session.data:
+            self.store.save(store_key(session.sid), data, expires)
+        elif session.expires - now < app.permanent_session_lifetime / 2:
+            self.store.touch(store_key(session.sid), expires)
+        else:
+            return      # Unchanged, the cookie stays as it is
+        self.start_purger()
+        response.set_cookie(self.get_cookie_name(app), session.sid,
+                            expires=self.get_expiration_time(app, session), **cookie)
+
+    # One daemon thread per app worker, started on the first write (after gunicorn forks)
+    def start_purger(self):
+        with self.lock:
+            if self.purger is None and self.purge_interval:
+                self.purger = threading.Thread(target=self._purge, name="session-purger", daemon=True)
+                self.purger.start()
+
+    def _purge(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                self.store.delete_expired(datetime.now())
+            except Exception:
+                self.logger.exception("Purging expired sessions failed")
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+
+""" STATIC ASSETS """
+# "flask build-static" copies the static files under content hashed names, with gzip & brotli copies of text files
+    # style.css -> <build folder>/css/style.3f2a9c1b.css (+ .gz, .br) and manifest.json mapping one to the other
+    # url_for('static', filename='css/style.css') then gives /static/css/style.3f2a9c1b.css,
+    # a new URL whenever the file changes, so browsers can keep them for good (Cache-Control: immutable)
+    # Without a build (development) the plain files are served as before
+
+MANIFEST = "manifest.json"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html", ".xml", ".map")
+ENCODINGS = {"br": ".br", "gzip": ".gz"}    # Preferred first
+
+
+def hashed_name(filename, content):
+    root, extension = os.path.splitext(filename)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:8]}{extension}"
+
+
+# Writes only when missing, an existing file with that name already has this content
+def write_once(path, content):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", "wb") as file:
+        file.write(content)
+    os.replace(path + ".part", path)
+
+
+# Compressed copies that are smaller than the file itself, {encoding: bytes}
+def compress(content):
+    import brotli   # Only needed to build
+    variants = {"br": brotli.compress(content, quality=11),
+                "gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+
+# Builds every file under static_folder except the excluded folders (uploads, thumbnails) and the build itself
+    # Older builds are left in place: pages cached or rendered by workers not restarted yet still point to them
+    # Returns the manifest, {filename: {"file": hashed name, "size": bytes, "encodings": {encoding: bytes}}}
+def build(static_folder, build_folder, exclude=()):
+    skipped = {os.path.abspath(folder) for folder in (build_folder, *exclude)}
+    manifest = {}
+    for folder, subfolders, files in os.walk(static_folder):
+        subfolders[:] = sorted(name for name in subfolders
+                               if os.path.abspath(os.path.join(folder, name)) not in skipped)
+        for name in sorted(files):
+            path = os.path.join(folder, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            with open(path, "rb") as file:
+                content = file.read()
+            hashed = hashed_name(filename, content)
+            target = os.path.join(build_folder, hashed)
+            write_once(target, content)
+            variants = compress(content) if filename.endswith(COMPRESSIBLE) else {}
+            for encoding, data in variants.items():
+                write_once(target + ENCODINGS[encoding], data)
+            manifest[filename] = {"file": hashed, "size": len(content),
+                                  "encodings": {encoding: len(data) for encoding, data in variants.items()}}
+
+    os.makedirs(build_folder, exist_ok=True)
+    path = os.path.join(build_folder, MANIFEST)
+    with open(path + ".part", "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + ".part", path)    # Workers starting meanwhile read the old or the new one, never half
+    return manifest
+
+
+# Serves the build in place of Flask's static view (set up by create_app)
+    # The manifest is read once per process, restart the workers after a build
+class StaticAssets:
+    def __init__(self, static_folder, build_folder, max_age):
+        self.static_folder = static_folder
+        self.build_folder = build_folder
+        self.max_age = max_age
+        self.urls = {}      # Plain name -> hashed name
+        self.files = {}     # Hashed name -> available encodings
+        path = os.path.join(build_folder, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as file:
+                for filename, entry in json.load(file).items():
+                    self.urls[filename] = entry["file"]
+                    self.files[entry["file"]] = [encoding for encoding in ENCODINGS if encoding in entry["encodings"]]
+
+    # url_defaults callback: swaps in the hashed name for url_for('static', ...)
+    def hashed_url(self, endpoint, values):
+        if endpoint == "static" and values.get("filename") in self.urls:
+            values["filename"] = self.urls[values["filename"]]
+
+    # The static view: hashed names come from the build, the best encoding the client accepts
+    def send(self, filename):
+        if filename not in self.files:
+            return current_app.send_static_file(filename)
+        encodings = self.files[filename]
+        encoding = next((encoding for encoding in encodings if request.accept_encodings[encoding]), None)
+        response = send_from_directory(self.build_folder, filename + ENCODINGS.get(encoding, ""),
+                                       mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                                       max_age=self.max_age)
+        if encoding:
+            response.content_encoding = encoding
+        if encodings:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
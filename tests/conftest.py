@@ -0,0 +1,64 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.loadtest.seed import PASSWORD, create_schema, seed
+
+
+""" FIXTURES """
+# One seeded SQLite database for the whole run, built the way the load test builds its own
+    # Passwords hashed with a cheap method and inline, no rate limits or CSRF so forms can be posted as is
+    # A request over its query budget (QUERY_BUDGET, e.g. an N+1 regression) fails the test
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    from app import create_app
+    from extensions import db
+
+    folder = tmp_path_factory.mktemp("flasker")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(folder / "test.db"),
+                      "SEARCH_INDEX_PATH": str(folder / "search_index.pkl.gz"),
+                      "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+                      "PASSWORD_HASH_WORKERS": 0,
+                      "RATE_LIMIT_BACKEND": "off",
+                      "WTF_CSRF_ENABLED": False,
+                      "TESTING": True,
+                      "QUERY_BUDGET_MODE": "raise"})
+    with app.app_context():
+        create_schema(db)
+        seed(db, 20, 200, app.config['PASSWORD_HASH_METHOD'])
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+# Logged in as user1, the admin
+@pytest.fixture
+def admin_client(client):
+    client.post("/login", data={"username": "user1", "password": PASSWORD})
+    return client
+
+
+# (statement, parameters) of every SQL statement the app's engine runs inside the block
+@contextmanager
+def captured_queries(app):
+    from extensions import db
+
+    with app.app_context():
+        engine = db.engine
+    queries = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        queries.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
@@ -0,0 +1,26 @@
+from conftest import captured_queries
+
+
+""" ADMIN """
+# Posts not backfilled yet (no excerpt) show their content, loaded for all of them in one query
+def test_not_backfilled_posts(app, admin_client):
+    from extensions import db
+    from models import Posts
+
+    with app.app_context():
+        posts = db.session.execute(db.select(Posts.id, Posts.excerpt, Posts.content)
+                                   .order_by(Posts.date_posted.desc()).limit(3)).all()
+        db.session.execute(db.update(Posts).where(Posts.id.in_([post.id for post in posts])).values(excerpt=None))
+        db.session.commit()
+    try:
+        with captured_queries(app) as queries:
+            page = admin_client.get("/admin?posts_sort=date_posted&posts_dir=desc").get_data(as_text=True)
+        for post in posts:
+            assert post.content[3:60] in page
+        content_queries = [statement for statement, _ in queries if "posts.content" in statement]
+        assert len(content_queries) == 1 and "posts.content_html" not in content_queries[0]
+    finally:
+        with app.app_context():
+            for post in posts:
+                db.session.execute(db.update(Posts).where(Posts.id == post.id).values(excerpt=post.excerpt))
+            db.session.commit()
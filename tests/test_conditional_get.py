@@ -0,0 +1,49 @@
+import re
+
+import pytest
+
+from conftest import PASSWORD, captured_queries
+
+
+""" CONDITIONAL GET """
+# A client's copy still current gets a 304 after the versions query alone, nothing else is loaded or rendered
+    # The ETag is the only validator: deleting a post or logging in/out must never answer a stale 304
+
+@pytest.mark.parametrize("path, versions", [("/posts", "FROM posts ORDER BY"), ("/posts/3", "FROM posts LEFT OUTER JOIN users")])
+def test_not_modified_queries(app, client, path, versions):
+    client.get(path)    # Flask-Login marks a new visitor's session not fresh on the next request, once
+    etag = client.get(path).headers["ETag"]
+    with captured_queries(app) as queries:
+        response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    statements = [statement for statement, _ in queries if "FROM sessions" not in statement]
+    assert len(statements) == 1, statements
+    assert versions in statements[0]
+
+@pytest.mark.parametrize("path", ["/posts", "/posts/3"])
+def test_etag_only(client, path):
+    response = client.get(path)
+    assert response.headers["ETag"] and "Last-Modified" not in response.headers
+    # A date past every post, would have matched any Last-Modified
+    future = client.get(path, headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert future.status_code == 200
+
+def test_deleted_post(app, client):
+    etag = client.get("/posts").headers["ETag"]
+    newest = int(re.search(r'href="/posts/(\d+)"', client.get("/posts").get_data(as_text=True)).group(1))
+    admin = app.test_client()
+    admin.post("/login", data={"username": "user1", "password": PASSWORD})
+    assert admin.post(f"/posts/delete/{newest}").status_code == 302
+
+    response = client.get("/posts", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert f'href="/posts/{newest}"' not in response.get_data(as_text=True)
+
+def test_login_logout(client):
+    etag = client.get("/posts").headers["ETag"]
+    client.post("/login", data={"username": "user2", "password": PASSWORD}, follow_redirects=True)
+    logged_in = client.get("/posts", headers={"If-None-Match": etag})
+    assert logged_in.status_code == 200
+
+    client.get("/logout", follow_redirects=True)
+    assert client.get("/posts", headers={"If-None-Match": logged_in.headers["ETag"]}).status_code == 200
@@ -0,0 +1,104 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from image_pipeline import (AVATAR_SIZES, NotAnImage, UploadTooLarge, collect_garbage, make_thumbnails, scrub_originals,
+                            store_upload, thumbnail_name)
+
+
+""" UPLOADS """
+# A 300x200 photo as a phone writes it: rotated by its EXIF, with the GPS position, camera and a comment
+def photo(fmt="JPEG", color="red"):
+    exif = Image.Exif()
+    exif[0x0112] = 6    # Orientation: rotate 90
+    exif[0x010F] = "PhoneMaker"
+    exif[0x8825] = {1: "N", 2: (52.0, 31.0, 12.0)}
+    out = io.BytesIO()
+    Image.new("RGB", (300, 200), color).save(out, fmt, exif=exif, comment=b"home address")
+    return out.getvalue()
+
+def upload(data, filename="me.jpg"):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+def assert_no_metadata(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    assert b"PhoneMaker" not in data and b"home address" not in data and b"Exif" not in data
+    with Image.open(path) as image:
+        assert not image.getexif()
+
+@pytest.mark.parametrize("fmt, extension", [("JPEG", ".jpg"), ("PNG", ".png"), ("WEBP", ".webp")])
+def test_metadata_stripped(tmp_path, fmt, extension):
+    key, created = store_upload(upload(photo(fmt), "photo.bin"), str(tmp_path), 10 ** 6)
+    assert created and key.endswith(extension)
+    assert_no_metadata(tmp_path / key)
+    with Image.open(tmp_path / key) as image:
+        assert image.size == (200, 300)    # Rotation applied to the pixels
+
+def test_same_picture_stored_once(tmp_path):
+    first = store_upload(upload(photo()), str(tmp_path), 10 ** 6)
+    assert store_upload(upload(photo()), str(tmp_path), 10 ** 6) == (first[0], False)
+    assert [name for name in os.listdir(tmp_path) if not os.path.isdir(tmp_path / name)] == []   # No temp files left
+
+def test_rejected_uploads(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        store_upload(upload(photo()), str(tmp_path), 100)
+    with pytest.raises(NotAnImage):
+        store_upload(upload(b"<html>not a picture</html>", "me.html"), str(tmp_path), 10 ** 6)
+    assert os.listdir(tmp_path) == []
+
+
+""" THUMBNAILS """
+def test_thumbnails(tmp_path):
+    os.makedirs(tmp_path / "images")
+    key, _ = store_upload(upload(photo()), str(tmp_path / "images"), 10 ** 6)
+    make_thumbnails(str(tmp_path / "images" / key), str(tmp_path / "thumbs"), key)
+    for size in AVATAR_SIZES:
+        for fmt in ("jpg", "webp"):
+            path = tmp_path / "thumbs" / thumbnail_name(key, size, fmt)
+            assert_no_metadata(path)
+            with Image.open(path) as image:
+                assert max(image.size) == size
+
+# Originals stored before uploads were re-encoded
+def test_scrub_originals(tmp_path):
+    key = "ab/" + "a" * 64 + ".jpg"
+    os.makedirs(tmp_path / "images" / "ab")
+    (tmp_path / "images" / key).write_bytes(photo())
+    assert scrub_originals(str(tmp_path / "images"), str(tmp_path / "thumbs")) == ([key], [])
+    assert_no_metadata(tmp_path / "images" / key)
+    assert os.path.exists(tmp_path / "thumbs" / thumbnail_name(key, AVATAR_SIZES[0], "webp"))
+
+def test_collect_garbage(tmp_path):
+    folder = tmp_path / "images"
+    os.makedirs(folder)
+    kept, _ = store_upload(upload(photo(color="red")), str(folder), 10 ** 6)
+    dropped, _ = store_upload(upload(photo(color="blue")), str(folder), 10 ** 6)
+    make_thumbnails(str(folder / dropped), str(tmp_path / "thumbs"), dropped)
+    assert collect_garbage(str(folder), str(tmp_path / "thumbs"), {kept}, 60) == []     # Too recent
+    assert collect_garbage(str(folder), str(tmp_path / "thumbs"), {kept}, 0) == [dropped]
+    assert os.path.exists(folder / kept) and not os.path.exists(folder / dropped)
+    assert os.listdir(tmp_path / "thumbs" / dropped[:2]) == []
+
+
+""" AVATAR ROUTE """
+# The re-encoded original until the thumbnail exists, then the thumbnail cached for good
+def test_avatar_route(app, client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path / "images"))
+    monkeypatch.setitem(app.config, "THUMBNAIL_FOLDER", str(tmp_path / "thumbs"))
+    os.makedirs(tmp_path / "images")
+    key, _ = store_upload(upload(photo()), str(tmp_path / "images"), 10 ** 6)
+
+    original = client.get(f"/avatars/80/webp/{key}")
+    assert original.status_code == 200 and original.data == (tmp_path / "images" / key).read_bytes()
+    assert "immutable" not in original.headers.get("Cache-Control", "")
+    original.close()
+
+    make_thumbnails(str(tmp_path / "images" / key), str(tmp_path / "thumbs"), key)
+    thumbnail = client.get(f"/avatars/80/webp/{key}")
+    assert thumbnail.data == (tmp_path / "thumbs" / thumbnail_name(key, 80, "webp")).read_bytes()
+    assert "immutable" in thumbnail.headers["Cache-Control"]
+    thumbnail.close()
@@ -0,0 +1,87 @@
+import re
+
+import pytest
+
+from conftest import captured_queries
+
+
+""" INDEX USAGE """
+# Runs the hot routes, then EXPLAIN QUERY PLAN on every statement they sent
+    # Each table they read must be searched or walked through an index: no plain "SCAN <table>"
+    # (full table scan) and no "USE TEMP B-TREE FOR ORDER BY" (sorting the rows instead of reading them in order)
+    # See the "hot path indexes" migration and Posts.__table_args__
+
+def query_plans(app, client, method, path, data=None):
+    from extensions import db
+
+    with captured_queries(app) as queries:
+        response = client.open(path, method=method, data=data)
+        response.get_data()     # /admin is streamed, its queries run while the body is read
+    assert response.status_code in (200, 302), response.status_code
+
+    plans = []
+    with app.app_context(), db.engine.connect() as connection:
+        for statement, parameters in queries:
+            if statement.lstrip().upper().startswith("SELECT"):
+                rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+                plans.append((statement, [row[-1] for row in rows]))
+    assert plans
+    return plans
+
+# A plain SCAN is fine when ordering by the table's id: that's walking its rowid b-tree in order, up to the LIMIT
+def assert_indexed(plans):
+    for statement, details in plans:
+        for detail in details:
+            full_scan = detail.startswith("SCAN ") and " USING " not in detail
+            if full_scan and f"ORDER BY {detail.split()[1]}.id " in statement:
+                full_scan = False
+            assert not full_scan and "TEMP B-TREE" not in detail, f"{detail}\n  in {statement}"
+
+def used_indexes(plans):
+    return " ".join(detail for _, details in plans for detail in details)
+
+
+# Feed: first page, older posts (before=) and newer posts (after=) through ix_posts_date_posted_id
+    # The after= cursor is the "Newer" link of the second page
+def feed_cursor(client, name):
+    next_page = re.search(r'href="(/posts\?before=[^"]+)"', client.get("/posts").get_data(as_text=True)).group(1)
+    if name == "before":
+        return next_page
+    return re.search(r'href="(/posts\?after=[^"]+)"', client.get(next_page).get_data(as_text=True)).group(1)
+
+@pytest.mark.parametrize("cursor", [None, "before", "after"])
+def test_feed(app, client, cursor):
+    path = "/posts" if cursor is None else feed_cursor(client, cursor)
+    plans = query_plans(app, client, "GET", path)
+    assert_indexed(plans)
+    assert "ix_posts_date_posted_id" in used_indexes(plans)
+
+def test_post_page(app, client):
+    assert_indexed(query_plans(app, client, "GET", "/posts/1"))
+
+
+# Admin tables, one author's posts through ix_posts_poster_id_date_posted
+def test_admin_author_filter(app, admin_client):
+    plans = query_plans(app, admin_client, "GET", "/admin?posts_author=2")
+    assert_indexed(plans)
+    assert "ix_posts_poster_id_date_posted" in used_indexes(plans)
+
+# The indexed admin orderings, both directions (name, title & post_count sort in memory, small pages)
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+@pytest.mark.parametrize("users_sort, posts_sort", [("date_added", "date_posted"), ("username", "id"), ("id", "date_posted")])
+def test_admin_sorts(app, admin_client, users_sort, posts_sort, direction):
+    path = f"/admin?users_sort={users_sort}&users_dir={direction}&posts_sort={posts_sort}&posts_dir={direction}"
+    assert_indexed(query_plans(app, admin_client, "GET", path))
+
+
+# Login looks the user up by username, sign up checks the email (their unique indexes)
+def test_username_lookup(app, client):
+    plans = query_plans(app, client, "POST", "/login", {"username": "user3", "password": "wrong"})
+    assert_indexed(plans)
+    assert "(username=?)" in used_indexes(plans)
+
+def test_email_lookup(app, client):
+    plans = query_plans(app, client, "POST", "/user/add", {"name": "Someone", "username": "user4", "email": "user4@example.com",
+                                                          "password": "secret1", "password2": "secret1"})
+    assert_indexed(plans)
+    assert "(email=?)" in used_indexes(plans)
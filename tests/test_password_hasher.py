@@ -0,0 +1,16 @@
+import pytest
+
+from password_hasher import PasswordHasher
+
+
+""" REHASHING """
+# Hashes made with the configured method never need a rehash, even when it is set by its short name
+@pytest.mark.parametrize("method", ["scrypt", "pbkdf2:sha256", "pbkdf2:sha256:1000"])
+def test_same_method_no_rehash(method):
+    hasher = PasswordHasher(method, 0, 1)
+    assert not hasher.needs_rehash(hasher.hash("secret1"))
+
+def test_other_cost_rehash():
+    old = PasswordHasher("pbkdf2:sha256:1000", 0, 1).hash("secret1")
+    assert PasswordHasher("pbkdf2:sha256:2000", 0, 1).needs_rehash(old)
+    assert PasswordHasher("scrypt", 0, 1).needs_rehash(old)
@@ -0,0 +1,64 @@
+import pytest
+
+from post_content import EXCERPT_CHARS, render_content, sanitize_html
+
+
+""" SANITIZER """
+# Dropped along with everything inside them
+@pytest.mark.parametrize("content", ['<script>alert(1)</script>',
+                                     '<SCRIPT type="text/javascript">alert(1)</SCRIPT>',
+                                     '<iframe src="https://example.com">inside</iframe>',
+                                     '<svg onload="alert(1)"><a href="/x">inside</a></svg>',
+                                     '<style>p { display: none }</style>'])
+def test_dropped_elements(content):
+    assert sanitize_html(f"<p>before</p>{content}<p>after</p>") == "<p>before</p><p>after</p>"
+
+@pytest.mark.parametrize("content, expected", [('<p onclick="alert(1)" onmouseover="alert(2)">t</p>', '<p>t</p>'),
+                                               ('<img src="/a.png" onerror="alert(1)">', '<img src="/a.png">'),
+                                               ('<a href="/x" ONFOCUS="alert(1)" style="color:red">t</a>', '<a href="/x">t</a>')])
+def test_event_attributes(content, expected):
+    assert sanitize_html(content) == expected
+
+@pytest.mark.parametrize("href", ["javascript:alert(1)",
+                                  "JaVaScRiPt:alert(1)",
+                                  " javascript:alert(1)",
+                                  "jav&#x09;ascript:alert(1)",
+                                  "jav\nascript:alert(1)",
+                                  "&#106;avascript:alert(1)",
+                                  "javascript&colon;alert(1)",
+                                  "vbscript:msgbox(1)",
+                                  "data:text/html,<script>alert(1)</script>"])
+def test_unsafe_urls(href):
+    assert sanitize_html(f'<a href="{href}">t</a><img src="{href}">') == "<a>t</a><img>"
+
+@pytest.mark.parametrize("href", ["https://example.com/?a=1&amp;b=2", "http://example.com", "mailto:me@example.com", "/posts/1"])
+def test_safe_urls(href):
+    assert sanitize_html(f'<a href="{href}">t</a>') == f'<a href="{href}">t</a>'
+
+def test_attribute_quoting():
+    assert sanitize_html('<a title=\'"><script>\'>t</a>') == '<a title="&quot;&gt;&lt;script&gt;">t</a>'
+
+# Output is always well nested, whatever was left open or closed out of order
+@pytest.mark.parametrize("content, expected", [("<p><b>open", "<p><b>open</b></p>"),
+                                               ("<b><i>misnested</b></i>", "<b><i>misnested</i></b>"),
+                                               ("</div>stray<br/>", "stray<br>"),
+                                               ("<p>text &lt;script&gt;</p>", "<p>text &lt;script&gt;</p>")])
+def test_nesting(content, expected):
+    assert sanitize_html(content) == expected
+
+
+""" DERIVED FIELDS """
+def test_short_post():
+    fields = render_content("<h2>Title</h2><p>One <b>two</b><br>three</p><script>four</script>")
+    assert fields["excerpt"] == "Title One two three"
+    assert fields["word_count"] == 4
+    assert fields["reading_minutes"] == 1
+
+def test_long_post():
+    fields = render_content("<p>" + "word, " * 401 + "</p>")
+    assert fields["word_count"] == 401
+    assert fields["reading_minutes"] == 3     # 200 words a minute, rounded up
+    assert fields["excerpt"].endswith("word…") and len(fields["excerpt"]) <= EXCERPT_CHARS + 1
+
+def test_empty_post():
+    assert render_content("") == {"content_html": "", "excerpt": "", "word_count": 0, "reading_minutes": 1}
@@ -0,0 +1,19 @@
+import re
+
+import pytest
+
+from profiler import QueryBudgetExceeded
+
+
+""" REQUEST PROFILER """
+# The suite runs with QUERY_BUDGET_MODE = "raise", a route going over its budget fails
+def test_over_budget(app, client, monkeypatch):
+    monkeypatch.setitem(app.config['QUERY_BUDGETS'], "blog.posts", 1)
+    with pytest.raises(QueryBudgetExceeded, match=r"blog\.posts ran \d+ queries \(budget 1\)"):
+        client.get("/posts")
+
+def test_server_timing(client):
+    timing = client.get("/posts").headers["Server-Timing"]
+    queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+    assert queries >= 1
+    assert re.search(r"render;dur=[\d.]+, total;dur=[\d.]+$", timing)
@@ -0,0 +1,70 @@
+import logging
+
+import pytest
+
+from conftest import PASSWORD
+from rate_limit import MemoryBucketStore, RateLimiter, SQLiteBucketStore
+
+
+""" BUCKETS """
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return MemoryBucketStore() if request.param == "memory" else SQLiteBucketStore(str(tmp_path / "rate_limits.db"))
+
+# 3 requests per 30 seconds: a burst of 3, then a token back every 10 seconds
+def test_burst_and_refill(store):
+    assert [store.take("k", 3, 0.1, 100) for _ in range(3)] == [0, 0, 0]
+    assert store.take("k", 3, 0.1, 100) == pytest.approx(10)
+    assert store.take("k", 3, 0.1, 104) == pytest.approx(6)
+    assert store.take("k", 3, 0.1, 110) == 0
+    assert store.take("k", 3, 0.1, 1000) == 0     # Refilled up to the capacity only
+    assert [store.take("k", 3, 0.1, 1000) for _ in range(3)] == [0, 0, pytest.approx(10)]
+
+# cost 0 looks without taking
+def test_check_only(store):
+    assert [store.take("k", 1, 0.1, 100, 0) for _ in range(5)] == [0] * 5
+    assert store.take("k", 1, 0.1, 100) == 0
+    assert store.take("k", 1, 0.1, 100, 0) == pytest.approx(10)
+
+
+""" LIMITER """
+@pytest.fixture
+def limiter(app, monkeypatch):
+    limiter = RateLimiter(MemoryBucketStore(), {"login": (3, 60)}, 0, logging.getLogger("test"))
+    monkeypatch.setitem(app.extensions, "rate_limiter", limiter)
+    return limiter
+
+def login(client, password, ip="10.0.0.1", username="user6"):
+    return client.post("/login", data={"username": username, "password": password}, environ_base={"REMOTE_ADDR": ip})
+
+def test_retry_after(app, limiter):
+    client = app.test_client()
+    responses = [login(client, "wrong", "10.0.0.9") for _ in range(4)]
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+    assert responses[-1].headers["Retry-After"] == "20"
+
+# Failed attempts count against the account for that client only, nobody else can lock it
+def test_account_not_locked_by_others(app, limiter):
+    attacker = app.test_client()
+    for n in range(10):
+        assert login(attacker, "wrong", f"10.0.2.{n}").status_code == 200
+    assert [login(attacker, "wrong", "10.0.2.0").status_code for _ in range(3)] == [200, 200, 429]
+    assert login(app.test_client(), PASSWORD, "10.0.3.1").status_code == 302
+
+@pytest.mark.parametrize("proxies, client_ip", [(0, "10.0.0.1"), (1, "2.2.2.2"), (2, "1.1.1.1"), (3, "9.9.9.9"), (4, "10.0.0.1")])
+def test_forwarded_for(app, limiter, proxies, client_ip):
+    limiter.proxies = proxies
+    with app.test_request_context(headers={"X-Forwarded-For": "9.9.9.9, 1.1.1.1,2.2.2.2"},
+                                  environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        assert limiter.client_ip() == client_ip
+
+# A broken store lets everything through, logged
+def test_store_failure(app, limiter, caplog):
+    class Broken:
+        def take(self, *args):
+            raise OSError("disk I/O error")
+
+    limiter.store = Broken()
+    client = app.test_client()
+    assert [login(client, "wrong").status_code for _ in range(5)] == [200] * 5
+    assert "Rate limit store failed" in caplog.text
@@ -0,0 +1,17 @@
+import re
+
+import pytest
+
+
+""" SEARCH """
+# Only the best SEARCH_RESULTS are shown, the page says when some were left out
+@pytest.mark.parametrize("shown, more", [(3, True), (1000, False)])
+def test_results_cap(app, client, monkeypatch, shown, more):
+    monkeypatch.setitem(app.config, "SEARCH_RESULTS", shown)
+    page = client.post("/search", data={"searched": "flask"}).get_data(as_text=True)
+    results = re.findall(r'href="/posts/(\d+)"', page)
+    assert ("best matches are shown" in page) is more
+    if more:
+        assert len(results) == shown
+    else:
+        assert 3 < len(results) < shown
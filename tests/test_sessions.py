@@ -0,0 +1,19 @@
+from conftest import PASSWORD, captured_queries
+
+
+""" SESSIONS """
+# Requests that never use the session (static files, /metrics) don't load it, even with a session cookie
+def test_unused_session_not_loaded(app, admin_client):
+    for path in ("/static/css/style.css", "/metrics"):
+        with captured_queries(app) as queries:
+            response = admin_client.get(path)
+        assert response.status_code == 200
+        assert not [statement for statement, _ in queries if "sessions" in statement], path
+
+# Flask-Login's remember cookie is still cleared on logout
+def test_logout_clears_remember_cookie(client):
+    client.post("/login", data={"username": "user5", "password": PASSWORD})
+    client.set_cookie("remember_token", "5|token")
+    response = client.get("/logout")
+    assert response.status_code == 302
+    assert any(header.startswith("remember_token=;") for header in response.headers.getlist("Set-Cookie"))
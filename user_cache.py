@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+
+""" USER CACHE """
+# Flask-Login loads the user on every authenticated request, this keeps a slim copy
+    # of the few fields current_user needs so most requests skip the users query
+    # Each worker has its own copy, the short TTL bounds how stale other workers can be
+
+
+# What current_user is between logins, pages needing the full row load Users themselves
+class SessionUser(UserMixin):
+    def __init__(self, id, username, name):
+        self.id = id
+        self.username = username
+        self.name = name
+
+    # User ID 1 is the admin (same rule as the admin routes)
+    @property
+    def is_admin(self):
+        return self.id == 1
+
+    def __repr__(self):
+        return '<SessionUser %r>' % self.username
+
+
+# LRU of SessionUsers by id, entries expire after ttl seconds
+class UserCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()    # id -> (expires at, SessionUser)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user):
+        with self.lock:
+            self.entries[user.id] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(user.id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries)}
@@ -0,0 +1,202 @@
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, send_from_directory, stream_template, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.orm import defer, load_only
+
+from extensions import db, password_hasher, profiler, user_cache
+from helpers import ADMIN_POST_SORTS, ADMIN_USER_SORTS, admin_table, invalidate_author, sync_author_name
+from image_pipeline import AVATAR_FORMATS, AVATAR_SIZES, thumbnail_name
+from metrics import render_metrics
+from models import Posts, Users
+from rate_limit import failed_attempt, rate_limit
+from webforms import NamerForm, UserForm
+
+import os
+
+
+""" USER MANAGEMENT """
+bp = Blueprint("users", __name__)
+
+# Name Page
+@bp.route("/user", methods=["GET", "POST"])
+def user():
+    form = NamerForm()
+    name = None # Assigning None to show form when value none and when name entered by user then it would show the greet message
+
+    # Validating form
+    if form.validate_on_submit():
+        name = form.name.data
+        flash("Form Submitted Successfully!")
+        return render_template("user.html", form=form, name=name)
+
+    else:
+        return render_template("user.html", form=form, name=name)
+
+# Admin User
+    # Both tables are paged, sorted & filtered by the DB, the page is streamed as it renders
+@bp.route("/admin")
+@login_required
+def admin():
+    # Logic to say user ID 1 is admin ()
+        # Not the best way to do this but a hacky way
+    if current_user.id != 1:
+        flash("You are not authorized to access this page...")
+        return redirect(url_for("auth.dashboard"))
+
+    # Users: username prefix as a range, LIKE would skip the unique index (case insensitive on SQLite)
+    users_q = request.args.get("users_q", "").strip()
+    user_filters = [Users.username >= users_q, Users.username < users_q + "\U0010ffff"] if users_q else []
+    # Posts: one author's, served by ix_posts_poster_id_date_posted
+    posts_author = request.args.get("posts_author", type=int)
+    post_filters = [Posts.poster_id == posts_author] if posts_author else []
+
+    our_users = admin_table("users", Users, ADMIN_USER_SORTS, user_filters)
+    posts = admin_table("posts", Posts, ADMIN_POST_SORTS, post_filters,
+                        options=[defer(Posts.content), defer(Posts.content_html)])
+    # Streamed after this view's session is gone, posts not backfilled yet get their content now (one query)
+        # Selecting them again with only their content fills it in on the rows already loaded
+    missing = [post.id for post in posts["rows"] if post.excerpt is None]
+    if missing:
+        db.session.scalars(db.select(Posts).where(Posts.id.in_(missing)).options(load_only(Posts.content))).all()
+    # Header & nav go out before the tables are rendered
+    return stream_template("admin.html",
+                           our_users=our_users,
+                           posts=posts,
+                           users_q=users_q,
+                           posts_author=posts_author)
+
+# Admin - Per route query counts & timings (this worker since it started)
+@bp.route("/admin/profile")
+@login_required
+def admin_profile():
+    if current_user.id == 1:
+        return {"endpoints": profiler.summary()}
+    else:
+        abort(403)
+
+# Prometheus scrape endpoint, totals across all workers
+@bp.route("/metrics")
+def metrics_endpoint():
+    return render_metrics()
+
+
+# Add User Page (Shows how to add to DB)
+@bp.route("/user/add", methods=["GET", "POST"])
+@rate_limit("add_user", account="email")
+def add_user():
+    # Checking if user is already logged in
+    if current_user.is_authenticated:
+        if current_user.id == 1:
+            pass
+        else:
+            flash("Already logged in!")
+            return redirect(url_for('auth.dashboard'))
+
+    form = UserForm()
+    our_users = Users.query.order_by(Users.date_added)
+
+    # Validating form
+    if form.validate_on_submit():
+        user = Users.query.filter_by(email=form.email.data).first() # Checking if current email exists
+
+        if user is None:    # if no existing users
+            # Hashing Pass
+            hashed_pw = password_hasher.hash(form.password.data)
+
+            # Updating user with values from form
+            user = Users(name=form.name.data,
+                         email=form.email.data,
+                         username=form.username.data,
+                         fav_color=form.fav_color.data,
+                         about_author=form.about_author.data,
+                         password_hash=hashed_pw)
+
+            # Commiting to DB
+            db.session.add(user)
+            db.session.commit()
+
+            flash("User Added Successfully!")
+            if current_user.is_authenticated:   # Diff routing for admin
+                if current_user.id == 1:
+                    return redirect(url_for('users.admin'))
+            else:
+                return redirect(url_for("auth.dashboard"))
+
+        else:
+            failed_attempt()    # Counted against the email (see rate_limit.py)
+            flash("Already Registered!")
+            return redirect(url_for("users.add_user"))
+
+
+    return render_template("add.html", form=form, our_users=our_users)
+
+
+# Update user route
+@bp.route("/update/<int:id>", methods=["GET", "POST"])
+@login_required
+def update(id):
+    form = UserForm()
+    user_to_update = Users.query.get_or_404(id)
+    if request.method == "POST":
+        # Updating from values from the template
+        user_to_update.name = request.form["name"]
+        user_to_update.email = request.form["email"]
+        user_to_update.username = request.form["username"]
+        user_to_update.fav_color = request.form["fav_color"]
+        user_to_update.about_author = request.form["about_author"]
+        try:
+            sync_author_name(user_to_update.id, user_to_update.name)
+            db.session.commit()
+            invalidate_author(user_to_update.id)    # Author name/about shown on their posts
+            user_cache.invalidate(user_to_update.id)
+            flash("User Updated Successfully!!!")
+            return redirect(url_for("auth.dashboard"))
+        except:
+            flash("User Update Failed!!! Try Again...")
+            return redirect(url_for("auth.dashboard"))
+    else:
+        return render_template("update.html",
+                               form=form,
+                               id=id,
+                               user_to_update=user_to_update)
+
+# Removing a user from db
+@bp.route("/delete/<int:id>")
+@login_required
+def delete(id):
+    user_to_delete = Users.query.get_or_404(id)
+
+    if current_user.id == user_to_delete.id or current_user.id == 1:
+        try:
+            invalidate_author(user_to_delete.id)    # Before deleting, their posts lose poster_id
+            sync_author_name(user_to_delete.id, None)   # Orphaned posts show no author, as before
+            db.session.delete(user_to_delete)
+            db.session.commit()
+            user_cache.invalidate(id)
+            flash("User Deleted Successfully!!!")
+            if current_user.id == 1:
+                return redirect(url_for('users.admin'))
+            else:
+                return redirect(url_for("users.add_user"))
+        except:
+            flash("Failed to delete user! Try again...")
+            return redirect(url_for("users.add_user"))
+    else:
+        flash("Unauthorized to delete selected user!")
+        return redirect(url_for('auth.dashboard'))
+
+# Profile pic at a fixed size & format
+    # Serves the original until the background thread has made the resized copy
+@bp.route("/avatars/<int:size>/<fmt>/<path:filename>")
+def avatar(size, fmt, filename):
+    if size not in AVATAR_SIZES or fmt not in AVATAR_FORMATS:
+        abort(404)
+    thumbnail = thumbnail_name(filename, size, fmt)
+    if os.path.exists(os.path.join(current_app.config['THUMBNAIL_FOLDER'], thumbnail)):
+        # Filenames are content hashes (or unique upload names), safe to cache for good
+        response = send_from_directory(current_app.config['THUMBNAIL_FOLDER'], thumbnail,
+                                       max_age=current_app.config['IMAGE_CACHE_MAX_AGE'])
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    # Not resized yet, this URL will change content so no long caching
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)